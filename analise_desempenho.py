@@ -0,0 +1,108 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# ================= ANÁLISE DE DESEMPENHO =================
+# Cada usuário tem um snapshot colunar das suas respostas já juntadas com os
+# atributos da questão. Na primeira leitura entram o resumo consolidado e a tabela
+# quente; depois, só as respostas com id maior que o último visto. Os agregados
+# são recalculados apenas quando o snapshot recebe linhas novas.
+
+JANELA_MOVEL_DIAS = 7
+PESO_PRIORI = 5  # respostas "fictícias" na taxa global, para temas com poucas tentativas
+COLUNAS_CATEGORICAS = ["materia", "tema", "banca"]
+
+SQL_RESPOSTAS = """
+SELECT r.id, r.data, q.materia, q.tema, q.banca, q.dificuldade, q.eh_real,
+       1 AS tentativas, r.acertou AS acertos
+FROM respostas r JOIN questoes_nomeadas q ON q.id = r.questao_id
+WHERE r.usuario_id = ? AND r.id > ?
+"""
+
+SQL_RESUMO = """
+SELECT NULL AS id, s.ultima_data AS data, q.materia, q.tema, q.banca, q.dificuldade, q.eh_real,
+       s.tentativas, s.acertos
+FROM respostas_resumo s JOIN questoes_nomeadas q ON q.id = s.questao_id
+WHERE s.usuario_id = ?
+"""
+
+def _taxa(acertos, tentativas):
+    acertos = np.asarray(acertos, dtype=float)
+    tentativas = np.asarray(tentativas, dtype=float)
+    return np.divide(acertos, tentativas, out=np.zeros_like(acertos), where=tentativas > 0)
+
+def _agrupar(dados, chaves):
+    grupos = dados.groupby(chaves, observed=True, sort=False)[["tentativas", "acertos"]].sum()
+    grupos["taxa_acerto"] = _taxa(grupos["acertos"], grupos["tentativas"])
+    return grupos.sort_values("tentativas", ascending=False)
+
+def calcular_desempenho(dados, limite_pontos_fracos=10):
+    tentativas = int(dados["tentativas"].sum())
+    acertos = int(dados["acertos"].sum())
+    taxa_global = acertos / tentativas if tentativas else 0.0
+
+    por_tema = _agrupar(dados, ["materia", "tema"])
+    pontos_fracos = por_tema.copy()
+    pontos_fracos["taxa_ajustada"] = (
+        (pontos_fracos["acertos"].to_numpy() + PESO_PRIORI * taxa_global)
+        / (pontos_fracos["tentativas"].to_numpy() + PESO_PRIORI)
+    )
+    pontos_fracos = pontos_fracos.sort_values("taxa_ajustada").head(limite_pontos_fracos)
+
+    diario = (
+        dados.dropna(subset=["data"]).set_index("data")[["tentativas", "acertos"]]
+        .resample("D").sum()
+    )
+    movel = diario.rolling(JANELA_MOVEL_DIAS, min_periods=1).sum()
+    evolucao = pd.DataFrame({
+        "respondidas": diario["tentativas"],
+        "taxa_acerto": _taxa(movel["acertos"], movel["tentativas"]),
+    }, index=diario.index)
+
+    return {
+        "tentativas": tentativas,
+        "acertos": acertos,
+        "taxa_global": taxa_global,
+        "por_materia": _agrupar(dados, "materia"),
+        "por_tema": por_tema,
+        "por_dificuldade": _agrupar(dados, "dificuldade").sort_index(),
+        "pontos_fracos": pontos_fracos,
+        "evolucao": evolucao,
+    }
+
+class SnapshotDesempenho:
+    def __init__(self, usuario_id):
+        self.usuario_id = usuario_id
+        self.ultimo_id = 0
+        self.dados = None
+        self._resultados = None
+        self._trava = threading.Lock()
+
+    def atualizar(self, conn):
+        with self._trava:
+            if self.dados is None:
+                # Uma instrução só: resumo e tabela quente lidos no mesmo instante
+                novos = pd.read_sql_query(f"{SQL_RESPOSTAS} UNION ALL {SQL_RESUMO}", conn, params=(self.usuario_id, 0, self.usuario_id))
+            else:
+                novos = pd.read_sql_query(SQL_RESPOSTAS, conn, params=(self.usuario_id, self.ultimo_id))
+            if novos.empty and self.dados is not None:
+                return self
+
+            if novos["id"].notna().any():
+                self.ultimo_id = int(novos["id"].max())
+            novos["data"] = pd.to_datetime(novos["data"], format="ISO8601", errors="coerce")
+            novos = novos.drop(columns="id")
+
+            dados = novos if self.dados is None else pd.concat([self.dados, novos], ignore_index=True)
+            for coluna in COLUNAS_CATEGORICAS:
+                dados[coluna] = dados[coluna].astype("category")
+            self.dados = dados
+            self._resultados = None
+        return self
+
+    def resultados(self):
+        with self._trava:
+            if self._resultados is None:
+                self._resultados = calcular_desempenho(self.dados)
+            return self._resultados
@@ -1,16 +1,24 @@
 import streamlit as st
 import sqlite3
-import pandas as pd
 from datetime import datetime
 import json
 import random
 import re
-import hashlib
 import time
+import threading
+from collections import defaultdict
 from typing import List, Dict, Any, Optional
 from groq import Groq
 from openai import OpenAI
 from duckduckgo_search import DDGS
+from banco import NOME_BANCO, abrir_conexao, buscar_id_cadastro, cadastrar_usuario, gerar_hash_questao, obter_id_cadastro, tem_indice_textual
+from compressao import carregar_codec
+from provedores_ia import ATRASO_HEDGE_PADRAO, TIMEOUT_CHAMADA_PADRAO, ProvedorIA, RoteadorIA
+from inferencia_local import JANELA_LOTE_PADRAO, MODELO_LOCAL_PADRAO, TAMANHO_LOTE_PADRAO, ProvedorLocal
+from modelos_prompt import TIPO_INEDITAS, TIPO_REAIS, classificar_formato, decodificar_questoes, montar_mensagens
+from voo_unico import VOO_UNICO, assinatura_mensagens, coalescer, normalizar_chave
+from analise_desempenho import JANELA_MOVEL_DIAS, SnapshotDesempenho
+from manutencao import ARQUIVO_PADRAO, INTERVALO_HORAS_PADRAO, RETENCAO_DIAS_PADRAO, AgendadorManutencao, apagar_historico_usuario
 
 # ================= CONFIGURAÇÃO VISUAL =================
 st.set_page_config(page_title="Plataforma de Alta Performance", layout="wide", initial_sidebar_state="expanded")
@@ -163,13 +171,48 @@ PERFIL_CARGO_DIFICULDADE = {
 }
 
 # ================= CHAVES DE IA =================
+def ler_config(chave, padrao):
+    try:
+        return st.secrets.get(chave, padrao)
+    except Exception:
+        return padrao
+
+# O roteador vive no processo (cache_resource) para acumular a latência de cada provedor entre sessões.
+# Cada provedor só entra se estiver configurado; LOCAL_LLM_BASE_URL aponta para um servidor
+# OpenAI-compatível próprio (llama.cpp, vLLM), cujas requisições são agrupadas em lotes.
+@st.cache_resource
+def iniciar_roteador_ia():
+    provedores = []
+    timeout = float(ler_config("TIMEOUT_IA_SEGUNDOS", TIMEOUT_CHAMADA_PADRAO))
+    if ler_config("GROQ_API_KEY", None):
+        provedores.append(ProvedorIA("Groq", Groq(api_key=st.secrets["GROQ_API_KEY"]), "llama-3.3-70b-versatile", timeout=timeout))
+    if ler_config("DEEPSEEK_API_KEY", None):
+        provedores.append(ProvedorIA("DeepSeek", OpenAI(api_key=st.secrets["DEEPSEEK_API_KEY"], base_url="https://api.deepseek.com"), "deepseek-chat", max_tokens=4000, timeout=timeout))
+    if ler_config("LOCAL_LLM_BASE_URL", None):
+        provedores.append(ProvedorLocal(
+            "Local",
+            OpenAI(api_key=ler_config("LOCAL_LLM_API_KEY", "sk-local"), base_url=st.secrets["LOCAL_LLM_BASE_URL"]),
+            ler_config("LOCAL_LLM_MODELO", MODELO_LOCAL_PADRAO),
+            max_tokens=int(ler_config("LOCAL_LLM_MAX_TOKENS", 4000)),
+            tamanho_lote=int(ler_config("LOCAL_LLM_TAMANHO_LOTE", TAMANHO_LOTE_PADRAO)),
+            janela=float(ler_config("LOCAL_LLM_JANELA_LOTE_SEGUNDOS", JANELA_LOTE_PADRAO)),
+            timeout=timeout,
+        ))
+    if not provedores:
+        raise RuntimeError("Nenhum provedor de IA configurado")
+    return RoteadorIA(provedores, atraso_hedge=float(ler_config("ATRASO_HEDGE_SEGUNDOS", ATRASO_HEDGE_PADRAO)))
+
+# Sem provedor o app continua abrindo (perfis, revisão, caderno); só a geração fica bloqueada
+AVISO_SEM_IA = "Nenhum provedor de IA disponível. Verifique os Segredos no Streamlit."
 try:
-    client_groq = Groq(api_key=st.secrets["GROQ_API_KEY"])
-    client_deepseek = OpenAI(api_key=st.secrets["DEEPSEEK_API_KEY"], base_url="https://api.deepseek.com")
+    roteador_ia = iniciar_roteador_ia()
 except Exception as e:
+    roteador_ia = None
     st.error("Erro ao carregar as chaves de API. Verifique os Segredos no Streamlit.")
 
 # ================= AGENTE DE BUSCA (SEQUENCIAL ANTI-CRASH) =================
+# Buscas idênticas em andamento (ex.: uma turma inteira no mesmo edital) viram uma só
+@coalescer("questoes_reais")
 def pesquisar_questoes_reais_banca(banca, cargo, materia, tema, quantidade):
     try:
         ddgs = DDGS()
@@ -195,6 +238,7 @@ def pesquisar_questoes_reais_banca(banca, cargo, materia, tema, quantidade):
     except Exception as e:
         return "Busca de questões reais indisponível."
 
+@coalescer("jurisprudencia")
 def pesquisar_jurisprudencia_banca(banca, cargo, materia):
     try:
         ddgs = DDGS()
@@ -205,6 +249,7 @@ def pesquisar_jurisprudencia_banca(banca, cargo, materia):
     except Exception as e:
         return "Busca de jurisprudência indisponível."
 
+@coalescer("estilo")
 def pesquisar_estilo_questoes_banca(banca):
     try:
         ddgs = DDGS()
@@ -218,72 +263,127 @@ def pesquisar_estilo_questoes_banca(banca):
 # ================= BANCO DE DADOS =================
 @st.cache_resource
 def iniciar_conexao():
-    conn = sqlite3.connect("estudos_multi_user.db", check_same_thread=False)
-    c = conn.cursor()
-    c.execute("""CREATE TABLE IF NOT EXISTS usuarios (nome TEXT PRIMARY KEY)""")
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS questoes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        banca TEXT, cargo TEXT, materia TEXT, tema TEXT,
-        enunciado TEXT, alternativas TEXT, gabarito TEXT,
-        explicacao TEXT, tipo TEXT, fonte TEXT,
-        dificuldade INTEGER DEFAULT 3, tags TEXT DEFAULT '[]',
-        formato_questao TEXT DEFAULT 'Múltipla Escolha',
-        eh_real INTEGER DEFAULT 0, ano_prova INTEGER DEFAULT 0, hash_questao TEXT DEFAULT ''
-    )
-    """)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS respostas (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        usuario TEXT, questao_id INTEGER, resposta_usuario TEXT,
-        acertou INTEGER, data TEXT, tempo_resposta INTEGER DEFAULT 0
-    )
-    """)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS editais_salvos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        usuario TEXT, nome_concurso TEXT, banca TEXT, cargo TEXT,
-        dados_json TEXT, data_analise TEXT, nivel_dificuldade INTEGER DEFAULT 3,
-        formato_questoes TEXT DEFAULT '[]'
+    return abrir_conexao()
+
+@st.cache_resource
+def obter_codec():
+    return carregar_codec(conn)
+
+# Consolidação de respostas antigas, ANALYZE, VACUUM incremental e checkpoint do WAL
+# rodam numa thread própria, uma por processo
+ARQUIVO_RESPOSTAS = ler_config("ARQUIVO_RESPOSTAS", ARQUIVO_PADRAO)
+
+@st.cache_resource
+def iniciar_manutencao():
+    agendador = AgendadorManutencao(
+        NOME_BANCO, ARQUIVO_RESPOSTAS,
+        retencao_dias=int(ler_config("RETENCAO_RESPOSTAS_DIAS", RETENCAO_DIAS_PADRAO)),
+        intervalo_horas=float(ler_config("INTERVALO_MANUTENCAO_HORAS", INTERVALO_HORAS_PADRAO)),
     )
-    """)
-    conn.commit()
-    return conn
+    agendador.start()
+    return agendador
 
 conn = iniciar_conexao()
 c = conn.cursor()
+codec = obter_codec()
+iniciar_manutencao()
 
 # ================= INICIALIZAÇÃO DE MEMÓRIA =================
 if "usuario_atual" not in st.session_state: st.session_state.usuario_atual = None
+if "usuario_id" not in st.session_state: st.session_state.usuario_id = None
 if "bateria_atual" not in st.session_state: st.session_state.bateria_atual = []
 if "edital_ativo" not in st.session_state: st.session_state.edital_ativo = None
+if "indice_caderno" not in st.session_state: st.session_state.indice_caderno = 0
+if "folha_respostas" not in st.session_state: st.session_state.folha_respostas = {}
+if "folha_tempos" not in st.session_state: st.session_state.folha_tempos = {}
+if "folha_exibido_em" not in st.session_state: st.session_state.folha_exibido_em = time.time()
+
+# ================= CACHE DE LEITURAS =================
+# Cada INSERT/DELETE em usuarios/editais_salvos incrementa a versão da tabela;
+# as leituras em cache recebem a versão como argumento e só expiram quando ela muda.
+@st.cache_resource
+def versoes_tabelas():
+    return defaultdict(int), threading.Lock()
+
+def versao_tabela(tabela):
+    versoes, _ = versoes_tabelas()
+    return versoes[tabela]
+
+def invalidar_tabela(tabela):
+    versoes, trava = versoes_tabelas()
+    with trava:
+        versoes[tabela] += 1
+
+@st.cache_data(show_spinner=False)
+def listar_usuarios(versao):
+    return dict(conn.execute("SELECT nome, id FROM usuarios ORDER BY id").fetchall())
+
+@st.cache_data(show_spinner=False, max_entries=1000)
+def listar_editais(usuario_id, versao):
+    linhas = conn.execute(
+        "SELECT id, nome_concurso, banca, cargo, dados_json, nivel_dificuldade FROM editais_salvos WHERE usuario_id = ? ORDER BY id DESC",
+        (usuario_id,)
+    ).fetchall()
+    return [
+        {"id": id_edital, "nome_concurso": nome, "banca": banca, "cargo": cargo,
+         "materias": json.loads(dados_json)['materias'], "nivel_dificuldade": nivel}
+        for id_edital, nome, banca, cargo, dados_json, nivel in linhas
+    ]
+
+# Snapshot de desempenho por usuário: atualizado de forma incremental a cada leitura;
+# "Zerar Progresso" incrementa a versão de `respostas` e descarta o snapshot antigo
+@st.cache_resource(max_entries=500)
+def obter_snapshot_desempenho(usuario_id, versao):
+    return SnapshotDesempenho(usuario_id)
+
+def carregar_desempenho(usuario_id):
+    return obter_snapshot_desempenho(usuario_id, versao_tabela("respostas")).atualizar(conn)
 
 # ================= FUNÇÕES AUXILIARES =================
-def obter_perfil_cargo(cargo_nome):
-    for chave, valor in PERFIL_CARGO_DIFICULDADE.items():
-        if chave.lower() in cargo_nome.lower() or cargo_nome.lower() in chave.lower():
-            return valor
-    return {"nível": 3, "descrição": "Médio", "características": ["Padrão"]}
+# Perfis indexados pelo nome em minúsculas: o nome exato sai de um dicionário;
+# só um nome parcial ("Delegado de Polícia Civil") percorre as chaves
+PERFIS_CARGO_POR_NOME = {chave.lower(): valor for chave, valor in PERFIL_CARGO_DIFICULDADE.items()}
+PERFIS_BANCA_POR_NOME = {chave.lower(): valor for chave, valor in PERFIL_BANCAS.items()}
+PERFIL_CARGO_PADRAO = {"nível": 3, "descrição": "Médio", "características": ["Padrão"]}
+PERFIL_BANCA_PADRAO = {
+    "formatos": ["Múltipla Escolha (A a E)"], "caracteristicas": ["padrão"],
+    "quantidade_alternativas": 5, "estilo_enunciado": "padrão",
+    "dificuldade_base": 3, "sites_busca": ["tecconcursos.com.br", "qconcursos.com"],
+    "exemplo": "Formato padrão com 5 alternativas."
+}
 
-def obter_perfil_banca(banca_nome):
-    for chave, valor in PERFIL_BANCAS.items():
-        if chave.lower() in banca_nome.lower() or banca_nome.lower() in chave.lower():
+def buscar_perfil(perfis, nome, padrao):
+    nome_lower = nome.lower()
+    perfil = perfis.get(nome_lower)
+    if perfil is not None:
+        return perfil
+    for chave, valor in perfis.items():
+        if chave in nome_lower or nome_lower in chave:
             return valor
-    return {
-        "formatos": ["Múltipla Escolha (A a E)"], "caracteristicas": ["padrão"],
-        "quantidade_alternativas": 5, "estilo_enunciado": "padrão",
-        "dificuldade_base": 3, "sites_busca": ["tecconcursos.com.br", "qconcursos.com"],
-        "exemplo": "Formato padrão com 5 alternativas."
-    }
+    return padrao
 
-def gerar_hash_questao(enunciado, gabarito):
-    conteudo = f"{enunciado}_{gabarito}".lower().strip()
-    return hashlib.md5(conteudo.encode('utf-8')).hexdigest()
+def obter_perfil_cargo(cargo_nome):
+    return buscar_perfil(PERFIS_CARGO_POR_NOME, cargo_nome, PERFIL_CARGO_PADRAO)
 
-def questao_ja_existe(enunciado, gabarito):
+def obter_perfil_banca(banca_nome):
+    return buscar_perfil(PERFIS_BANCA_POR_NOME, banca_nome, PERFIL_BANCA_PADRAO)
+
+# Banca/cargo/matéria são gravados como ids dos cadastros; a grafia é canonizada uma vez aqui
+def ids_cadastro(banca, cargo, materia):
+    return (
+        obter_id_cadastro(conn, "bancas", banca),
+        obter_id_cadastro(conn, "cargos", cargo),
+        obter_id_cadastro(conn, "materias", materia),
+    )
+
+def obter_id_questao(enunciado, gabarito):
     hash_q = gerar_hash_questao(enunciado, gabarito)
     c.execute("SELECT id FROM questoes WHERE hash_questao = ?", (hash_q,))
-    return c.fetchone() is not None
+    linha = c.fetchone()
+    return linha[0] if linha else None
+
+def questao_ja_existe(enunciado, gabarito):
+    return obter_id_questao(enunciado, gabarito) is not None
 
 def normalizar_gabarito(gabarito_raw):
     if not gabarito_raw:
@@ -311,203 +411,368 @@ def extrair_letra_opcao(opcao_texto, tem_alternativas):
             return match.group(1)
     return texto
 
-# ================= GERAÇÃO DE PROMPTS =================
-def gerar_prompt_questoes_ineditas(qtd, banca_alvo, cargo_alvo, mat_final, tema_selecionado, contexto_jurisprudencia, contexto_estilo):
-    perfil_banca = obter_perfil_banca(banca_alvo)
-    perfil_cargo = obter_perfil_cargo(cargo_alvo)
+# ================= CONTEXTO LOCAL (QUESTÕES REAIS DO BANCO) =================
+# Antes de ir à web, procura no próprio banco questões reais da mesma banca/matéria.
+# Com cobertura suficiente no tema pedido, elas viram o contexto de estilo das
+# inéditas e a busca na web é dispensada. Nas reais a web continua: o modelo
+# precisa de provas de verdade para transcrever, não só de exemplos de estilo.
+COBERTURA_MINIMA_LOCAL = int(ler_config("COBERTURA_MINIMA_LOCAL", 5))
+LIMITE_EXEMPLOS_LOCAIS = 6
 
-    nivel_dif = perfil_cargo["nível"]
-    descricao_dif = perfil_cargo["descrição"]
-    formatos_banca = perfil_banca["formatos"]
-    caracteristicas_banca = ", ".join(perfil_banca["caracteristicas"])
-    formato_principal = formatos_banca[0]
-    estilo_enunciado = perfil_banca["estilo_enunciado"]
-
-    if "Certo/Errado" in formato_principal:
-        instrucao_formato = f"""
-        FORMATO OBRIGATÓRIO: Certo/Errado (Padrão da {banca_alvo})
-        - Cada questão deve ter uma assertiva clara
-        - Gabarito: use EXATAMENTE a palavra "Certo" ou "Errado"
-        - Sem alternativas A, B, C, D, E
-        - Estilo: {estilo_enunciado}
-        """
-        regras_json_alt = '"alternativas": {}'
-    elif "A a D" in formato_principal:
-        instrucao_formato = f"""
-        FORMATO OBRIGATÓRIO: Múltipla Escolha com 4 alternativas DIFERENTES (A, B, C, D)
-        - Gabarito: use EXATAMENTE uma letra isolada: "A", "B", "C" ou "D"
+@st.cache_resource
+def indice_textual_disponivel():
+    return tem_indice_textual(conn)
+
+def buscar_questoes_reais_locais(banca, cargo, materia, tema, limite=LIMITE_EXEMPLOS_LOCAIS):
+    banca_id = buscar_id_cadastro(conn, "bancas", banca)
+    materia_id = buscar_id_cadastro(conn, "materias", materia)
+    if banca_id is None or materia_id is None:
+        return [], 0
+    cargo_id = buscar_id_cadastro(conn, "cargos", cargo)
+    filtros = "q.eh_real = 1 AND q.banca_id = ? AND q.materia_id = ?"
+    params_filtro = [banca_id, materia_id]
+    termos = re.findall(r"\w{3,}", tema) if tema.lower() != "aleatório" else []
+    usar_indice = bool(termos) and indice_textual_disponivel()
+    consulta = " OR ".join(f'"{termo}"' for termo in termos)
+
+    # Só conta como cobertura o que é do tema pedido; o resto da banca/matéria ainda serve de exemplo
+    if usar_indice:
+        sql_cobertura = f"{filtros} AND q.id IN (SELECT rowid FROM questoes_fts WHERE questoes_fts MATCH ?)"
+        params_cobertura = [*params_filtro, consulta]
+    elif tema.lower() != "aleatório":
+        sql_cobertura = f"{filtros} AND q.tema = ?"
+        params_cobertura = [*params_filtro, tema]
+    else:
+        sql_cobertura, params_cobertura = filtros, params_filtro
+    cobertura = c.execute(f"SELECT COUNT(*) FROM questoes q WHERE {sql_cobertura}", params_cobertura).fetchone()[0]
+
+    if usar_indice:
+        # Questões que casam com o tema (ranking bm25) primeiro; depois mesmo cargo
+        sql = f"""
+        SELECT q.enunciado, q.alternativas, q.gabarito, q.explicacao
+        FROM questoes q
+        LEFT JOIN (
+            SELECT rowid, bm25(questoes_fts) AS relevancia FROM questoes_fts WHERE questoes_fts MATCH ?
+        ) f ON f.rowid = q.id
+        WHERE {filtros}
+        ORDER BY f.relevancia IS NULL, f.relevancia, q.cargo_id IS ? DESC, q.id DESC
+        LIMIT ?
         """
-        regras_json_alt = '"alternativas": {"A": "Alternativa única", "B": "Alternativa única diferente", "C": "Alternativa única diferente", "D": "Alternativa única diferente"}'
+        params = [consulta, *params_filtro, cargo_id, limite]
     else:
-        instrucao_formato = f"""
-        FORMATO OBRIGATÓRIO: Múltipla Escolha com 5 alternativas TODAS DIFERENTES (A, B, C, D, E)
-        - Gabarito: use EXATAMENTE uma letra isolada: "A", "B", "C", "D" ou "E"
+        sql = f"""
+        SELECT q.enunciado, q.alternativas, q.gabarito, q.explicacao
+        FROM questoes q
+        WHERE {filtros}
+        ORDER BY q.cargo_id IS ? DESC, RANDOM()
+        LIMIT ?
         """
-        regras_json_alt = '"alternativas": {"A": "Alternativa 1 única", "B": "Alternativa 2 única diferente", "C": "Alternativa 3 única diferente", "D": "Alternativa 4 única diferente", "E": "Alternativa 5 única diferente"}'
-
-    instrucao_ia = f"""
-    ⭐ CRIAÇÃO DE QUESTÕES INÉDITAS E ÚNICAS ⭐
-    Você CRIARÁ questões NOVAS, ORIGINAIS e NUNCA VISTAS. Não copie questões existentes.
-    PADRÃO DA BANCA {banca_alvo}: {caracteristicas_banca}
-    NÍVEL: {descricao_dif} (Nível {nivel_dif}/5)
-    JURISPRUDÊNCIA PARA INSPIRAÇÃO: {contexto_jurisprudencia[:2000]}
-    
-    ATENÇÃO: BASEIE-SE EXCLUSIVAMENTE NA LEGISLAÇÃO E JURISPRUDÊNCIA BRASILEIRAS VIGENTES.
-    """
-
-    prompt = f"""
-    🎨 PROTOCOLO DE CRIAÇÃO DE QUESTÕES INÉDITAS
-    {instrucao_ia}
-    MISSÃO: Gere {qtd} questões COMPLETAMENTE ORIGINAIS.
-    Matéria: {mat_final} | Tema: {tema_selecionado} | Cargo: {cargo_alvo}
-    {instrucao_formato}
-
-    DIRETRIZ CRÍTICA DE EXPLICAÇÃO (ANATOMIA DIDÁTICA DO ERRO):
-    É estritamente proibido fornecer explicações rasas (ex: "Correta, pois garante segurança jurídica"). 
-    Para CADA alternativa nos 'comentarios', você DEVE atuar como um professor de Direito:
-    1. Defina rapidamente o instituto jurídico envolvido.
-    2. Cite a norma brasileira (artigo/lei) ou Súmula/Tema do STF/STJ que fundamenta o acerto ou o erro.
-    3. Explique de forma prática POR QUE a alternativa falhou ou acertou.
-
-    JSON EXATO (IMPERATIVO):
-    {{
-      "questoes": [
-        {{
-          "enunciado": "Enunciado ÚNICO e INÉDITO",
-          {regras_json_alt},
-          "gabarito": "Letra isolada (ex: A) ou Certo/Errado",
-          "explicacao": "Fundamentação legal e jurisprudencial ESPECÍFICA geral da questão.",
-          "comentarios": {{
-              "A": "Explicação didática profunda: conceito + artigo de lei/súmula brasileira + motivo do erro/acerto.", 
-              "B": "Explicação didática profunda: conceito + artigo de lei/súmula brasileira + motivo do erro/acerto."
-          }},
-          "fonte": "Inédita IA - Estilo {banca_alvo} - Nível {descricao_dif}",
-          "dificuldade": {nivel_dif},
-          "tags": ["inédita", "jurisprudência", "{cargo_alvo}"],
-          "formato": "{formato_principal}",
-          "eh_real": 0
-        }}
-      ]
-    }}
-    """
-    return prompt
+        params = [*params_filtro, cargo_id, limite]
+
+    exemplos = []
+    for enunciado, alternativas, gabarito, explicacao in c.execute(sql, params).fetchall():
+        try:
+            fundamentacao = json.loads(codec.descomprimir(explicacao)).get("geral", "")
+        except Exception:
+            fundamentacao = ""
+        exemplos.append({
+            "enunciado": enunciado,
+            "alternativas": json.loads(codec.descomprimir(alternativas)) if alternativas else {},
+            "gabarito": gabarito,
+            "fundamentacao": fundamentacao,
+        })
+    return exemplos, cobertura
+
+def montar_contexto_local(exemplos):
+    blocos = []
+    for exemplo in exemplos:
+        bloco = f"Enunciado: {exemplo['enunciado']}\n"
+        if exemplo["alternativas"]:
+            bloco += "Alternativas: " + " | ".join(f"{letra}) {texto}" for letra, texto in exemplo["alternativas"].items()) + "\n"
+        bloco += f"Gabarito: {exemplo['gabarito']}"
+        blocos.append(bloco)
+    return "\n---\n".join(blocos)
+
+def montar_fundamentacao_local(exemplos):
+    return "\n".join(f"- {exemplo['fundamentacao']}" for exemplo in exemplos if exemplo["fundamentacao"])
 
-def gerar_prompt_questoes_reais(qtd, banca_alvo, cargo_alvo, mat_final, tema_selecionado, contexto_reais):
+# ================= GERAÇÃO DE PROMPTS =================
+# Prefixo de sistema fixo por tipo/formato (ver modelos_prompt.py); aqui só o sufixo variável
+# Campos que o modelo não precisa gerar: preenchidos na decodificação da resposta
+def campos_fixos_questoes(tipo, banca_alvo, cargo_alvo):
+    perfil_cargo = obter_perfil_cargo(cargo_alvo)
+    formato_principal = obter_perfil_banca(banca_alvo)["formatos"][0]
+    if tipo == TIPO_INEDITAS:
+        return {
+            "fonte": f"Inédita IA - Estilo {banca_alvo} - Nível {perfil_cargo['descrição']}",
+            "dificuldade": perfil_cargo["nível"],
+            "tags": ["inédita", "jurisprudência", cargo_alvo],
+            "formato": formato_principal,
+            "eh_real": 0,
+        }
+    return {
+        "fonte": f"{banca_alvo} - {cargo_alvo} - Concurso Público",
+        "dificuldade": perfil_cargo["nível"],
+        "tags": ["prova_real", "oficial", cargo_alvo],
+        "formato": formato_principal,
+        "eh_real": 1,
+    }
+
+def gerar_prompt_questoes_ineditas(qtd, banca_alvo, cargo_alvo, mat_final, tema_selecionado, contexto_jurisprudencia, contexto_estilo):
     perfil_banca = obter_perfil_banca(banca_alvo)
     perfil_cargo = obter_perfil_cargo(cargo_alvo)
+
     nivel_dif = perfil_cargo["nível"]
+    descricao_dif = perfil_cargo["descrição"]
     formato_principal = perfil_banca["formatos"][0]
 
-    if "Certo/Errado" in formato_principal:
-        regras_json_alt = '"alternativas": {}'
-        instrucao_gabarito = 'Gabarito: use EXATAMENTE "Certo" ou "Errado"'
-    elif "A a D" in formato_principal:
-        regras_json_alt = '"alternativas": {"A": "...", "B": "...", "C": "...", "D": "..."}'
-        instrucao_gabarito = 'Gabarito: use EXATAMENTE uma letra isolada: "A", "B", "C" ou "D"'
-    else:
-        regras_json_alt = '"alternativas": {"A": "...", "B": "...", "C": "...", "D": "...", "E": "..."}'
-        instrucao_gabarito = 'Gabarito: use EXATAMENTE uma letra isolada: "A", "B", "C", "D" ou "E"'
-
-    prompt = f"""
-    📋 PROTOCOLO DE TRANSCRIÇÃO DE QUESTÕES REAIS DE PROVAS
-    Você TRANSCREVERÁ questões REAIS de provas anteriores da banca {banca_alvo}.
-    CONTEXTO DAS PROVAS REAIS: {contexto_reais[:4000]}
-    MISSÃO: Transcreva EXATAMENTE {qtd} questões reais de provas anteriores.
-    Banca: {banca_alvo} | Cargo: {cargo_alvo} | Matéria: {mat_final} | Tema: {tema_selecionado}
-    {instrucao_gabarito}
-    
-    ATENÇÃO: BASEIE-SE EXCLUSIVAMENTE NA LEGISLAÇÃO E JURISPRUDÊNCIA BRASILEIRAS VIGENTES.
-    
-    DIRETRIZ CRÍTICA DE EXPLICAÇÃO (ANATOMIA DIDÁTICA DO ERRO):
-    É estritamente proibido fornecer explicações rasas (ex: "A alternativa B é o gabarito oficial"). 
-    Para CADA alternativa nos 'comentarios', ensine o assunto:
-    1. Defina rapidamente o conceito jurídico daquela alternativa.
-    2. Cite a norma brasileira (artigo/lei) ou Súmula do STF/STJ correspondente.
-    3. Explique de forma prática o erro ou acerto jurídico.
-
-    JSON EXATO (IMPERATIVO):
-    {{
-      "questoes": [
-        {{
-          "enunciado": "Enunciado EXATO da prova real",
-          {regras_json_alt},
-          "gabarito": "Letra isolada ou Certo/Errado",
-          "explicacao": "Fundamentação jurídica geral da questão.",
-          "comentarios": {{
-              "A": "Explicação didática profunda: conceito + artigo de lei/súmula brasileira + motivo do erro/acerto.", 
-              "B": "Explicação didática profunda: conceito + artigo de lei/súmula brasileira + motivo do erro/acerto."
-          }},
-          "fonte": "{banca_alvo} - {cargo_alvo} - Concurso Público",
-          "dificuldade": {nivel_dif},
-          "tags": ["prova_real", "oficial", "{cargo_alvo}"],
-          "formato": "{formato_principal}",
-          "eh_real": 1,
-          "ano_prova": 2023
-        }}
-      ]
-    }}
-    """
-    return prompt
+    return montar_mensagens(TIPO_INEDITAS, classificar_formato(formato_principal), [
+        ("PADRÃO DA BANCA " + banca_alvo, ", ".join(perfil_banca["caracteristicas"])),
+        ("ESTILO DO ENUNCIADO", perfil_banca["estilo_enunciado"]),
+        ("NÍVEL", f"{descricao_dif} (Nível {nivel_dif}/5)"),
+        ("Cargo", cargo_alvo),
+        ("Matéria", mat_final),
+        ("Tema", tema_selecionado),
+        ("JURISPRUDÊNCIA PARA INSPIRAÇÃO", contexto_jurisprudencia[:2000]),
+        ("EXEMPLOS DO ESTILO DA BANCA", contexto_estilo[:3000]),
+        ("MISSÃO", f"Gere {qtd} questões COMPLETAMENTE ORIGINAIS."),
+    ])
 
 def gerar_prompt_questoes_reais(qtd, banca_alvo, cargo_alvo, mat_final, tema_selecionado, contexto_reais):
-    perfil_banca = obter_perfil_banca(banca_alvo)
-    perfil_cargo = obter_perfil_cargo(cargo_alvo)
-    nivel_dif = perfil_cargo["nível"]
-    formato_principal = perfil_banca["formatos"][0]
+    formato_principal = obter_perfil_banca(banca_alvo)["formatos"][0]
+
+    return montar_mensagens(TIPO_REAIS, classificar_formato(formato_principal), [
+        ("Banca", banca_alvo),
+        ("Cargo", cargo_alvo),
+        ("Matéria", mat_final),
+        ("Tema", tema_selecionado),
+        ("CONTEXTO DAS PROVAS REAIS", contexto_reais[:4000]),
+        ("MISSÃO", f"Transcreva EXATAMENTE {qtd} questões reais de provas anteriores."),
+    ])
+
+# ================= CADERNO DE PROVA =================
+def iniciar_bateria(ids_questoes):
+    st.session_state.bateria_atual = ids_questoes
+    st.session_state.indice_caderno = 0
+    st.session_state.folha_respostas = {}
+    st.session_state.folha_tempos = {}
+    st.session_state.folha_exibido_em = time.time()
+
+def mudar_pagina_caderno(passo):
+    total_itens = len(st.session_state.bateria_atual)
+    st.session_state.indice_caderno = max(0, min(st.session_state.indice_caderno + passo, total_itens - 1))
+
+# Folha de Respostas: as marcações ficam na sessão (com o tempo gasto em cada item)
+# e vão para o banco de uma vez só, na entrega.
+def registrar_item_folha(q_id, passo=0):
+    agora = time.time()
+    tempos = st.session_state.folha_tempos
+    tempos[q_id] = tempos.get(q_id, 0) + (agora - st.session_state.folha_exibido_em)
+    st.session_state.folha_exibido_em = agora
+
+    escolha = st.session_state.get(f"folha_{q_id}")
+    if escolha == "Selecionar...":
+        # Voltar para "Selecionar..." desmarca o item
+        st.session_state.folha_respostas.pop(q_id, None)
+    elif escolha is not None:
+        st.session_state.folha_respostas[q_id] = escolha
+    mudar_pagina_caderno(passo)
+
+# O tempo na Folha só conta a partir da entrada no modo, não desde o início da bateria
+def mudar_modo_caderno():
+    st.session_state.folha_exibido_em = time.time()
+
+def entregar_folha(q_id_atual):
+    registrar_item_folha(q_id_atual)
+    marcadas = st.session_state.folha_respostas
+    if not marcadas:
+        return
+
+    ids_str = ','.join(map(str, marcadas))
+    c.execute(f"SELECT id, gabarito, formato_questao FROM questoes WHERE id IN ({ids_str})")
+    gabaritos = {q_id: (normalizar_gabarito(gab), "Certo/Errado" in (formato or "")) for q_id, gab, formato in c.fetchall()}
+    c.execute(f"SELECT questao_id FROM respostas_consolidadas WHERE usuario_id = ? AND questao_id IN ({ids_str})", (st.session_state.usuario_id,))
+    for (q_id,) in c.fetchall():
+        gabaritos.pop(q_id, None)
+
+    data_entrega = str(datetime.now())
+    linhas = []
+    for q_id, escolha in marcadas.items():
+        if q_id not in gabaritos:
+            continue
+        gabarito, is_certo_errado = gabaritos[q_id]
+        letra_escolhida = extrair_letra_opcao(escolha, not is_certo_errado)
+        tempo = round(st.session_state.folha_tempos.get(q_id, 0))
+        linhas.append((st.session_state.usuario_id, q_id, letra_escolhida, 1 if letra_escolhida == gabarito else 0, data_entrega, tempo))
+
+    c.executemany("""
+    INSERT INTO respostas (usuario_id, questao_id, resposta_usuario, acertou, data, tempo_resposta)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """, linhas)
+    conn.commit()
+    st.session_state.folha_respostas = {}
+    st.session_state.folha_tempos = {}
 
-    if "Certo/Errado" in formato_principal:
-        regras_json_alt = '"alternativas": {}'
-        instrucao_gabarito = 'Gabarito: use EXATAMENTE "Certo" ou "Errado"'
-    elif "A a D" in formato_principal:
-        regras_json_alt = '"alternativas": {"A": "...", "B": "...", "C": "...", "D": "..."}'
-        instrucao_gabarito = 'Gabarito: use EXATAMENTE uma letra isolada: "A", "B", "C" ou "D"'
-    else:
-        regras_json_alt = '"alternativas": {"A": "...", "B": "...", "C": "...", "D": "...", "E": "..."}'
-        instrucao_gabarito = 'Gabarito: use EXATAMENTE uma letra isolada: "A", "B", "C", "D" ou "E"'
-
-    prompt = f"""
-    📋 PROTOCOLO DE TRANSCRIÇÃO DE QUESTÕES REAIS DE PROVAS
-    Você TRANSCREVERÁ questões REAIS de provas anteriores da banca {banca_alvo}.
-    CONTEXTO DAS PROVAS REAIS: {contexto_reais[:4000]}
-    MISSÃO: Transcreva EXATAMENTE {qtd} questões reais de provas anteriores.
-    Banca: {banca_alvo} | Cargo: {cargo_alvo} | Matéria: {mat_final} | Tema: {tema_selecionado}
-    {instrucao_gabarito}
-
-    JSON EXATO (IMPERATIVO):
-    {{
-      "questoes": [
-        {{
-          "enunciado": "Enunciado EXATO da prova real",
-          {regras_json_alt},
-          "gabarito": "Letra isolada ou Certo/Errado",
-          "explicacao": "Explicação oficial",
-          "comentarios": {{"A": "Por que está certa/errada", "B": "Por que está certa/errada"}},
-          "fonte": "{banca_alvo} - {cargo_alvo} - Concurso Público",
-          "dificuldade": {nivel_dif},
-          "tags": ["prova_real", "oficial", "{cargo_alvo}"],
-          "formato": "{formato_principal}",
-          "eh_real": 1,
-          "ano_prova": 2023
-        }}
-      ]
-    }}
-    """
-    return prompt
+# Questões não mudam depois de gravadas: o HTML da análise depende só de (questao_id, resposta, acerto gravado)
+@st.cache_data(show_spinner=False, max_entries=5000)
+def montar_analise_html(questao_id, resposta_usuario, acertou, _opcoes, _gabarito, _explicacao, _is_certo_errado):
+    _explicacao = codec.descomprimir(_explicacao)
+    try:
+        exp_data = json.loads(_explicacao)
+        if isinstance(exp_data, dict) and "geral" in exp_data:
+            exp_geral = exp_data["geral"]
+            exp_detalhes = exp_data.get("detalhes", {})
+        else:
+            exp_geral = _explicacao
+            exp_detalhes = {}
+    except:
+        exp_geral = _explicacao
+        exp_detalhes = {}
+
+    blocos = ["<br><b>Análise Detalhada das Alternativas:</b>"]
+    for opcao in _opcoes:
+        letra_opcao = extrair_letra_opcao(opcao, not _is_certo_errado)
+
+        if letra_opcao == resposta_usuario:
+            if acertou:
+                blocos.append(f"<div class='alt-correta'>✅ <b>{opcao}</b> (Sua Resposta Correta)</div>")
+            else:
+                blocos.append(f"<div class='alt-errada'>❌ <b>{opcao}</b> (Sua Resposta Incorreta)</div>")
+        elif letra_opcao == _gabarito and not acertou:
+            blocos.append(f"<div class='alt-gabarito'>🎯 <b>{opcao}</b> (Gabarito Oficial)</div>")
+        else:
+            blocos.append(f"<div class='alt-neutra'>{opcao}</div>")
+
+        if not _is_certo_errado and letra_opcao in exp_detalhes and exp_detalhes[letra_opcao]:
+            blocos.append(f"<div class='comentario-alt'>💡 <i><b>Por que?</b> {exp_detalhes[letra_opcao]}</i></div>")
+
+    return "\n".join(blocos), exp_geral
+
+def renderizar_questao(i, q_id, respondidas, modo_folha=False):
+    c.execute(
+        "SELECT banca, cargo, materia, enunciado, alternativas, gabarito, explicacao, fonte, dificuldade, tags, formato_questao, eh_real FROM questoes_nomeadas WHERE id = ?",
+        (q_id,)
+    )
+    dados = c.fetchone()
+    if not dados:
+        return
+
+    q_banca, q_cargo, q_mat, q_enun, q_alt, q_gab, q_exp, q_fonte, q_dif, q_tags, q_formato, eh_real = dados
+    alts = json.loads(codec.descomprimir(q_alt)) if q_alt else {}
+    tags_list = json.loads(codec.descomprimir(q_tags)) if q_tags else []
+
+    q_gab_normalizado = normalizar_gabarito(q_gab)
+
+    dif_label = ["Muito Fácil", "Fácil", "Médio", "Difícil", "Muito Difícil"][min(q_dif - 1, 4)] if q_dif else "Médio"
+    dif_classe = "dif-facil" if q_dif <= 2 else "dif-medio" if q_dif == 3 else "dif-dificil"
+    tipo_questao = "Prova Real" if eh_real else "Inédita IA"
+    tipo_classe = "tipo-real" if eh_real else "tipo-inedita"
+
+    with st.container(border=True):
+        col_info, col_tipo, col_dif = st.columns([3, 1, 1])
+        with col_info:
+            st.caption(f"**Item {i+1}** | 🏢 {q_banca} | 📚 {q_mat} | 🎯 {q_formato}")
+        with col_tipo:
+            st.markdown(f"<span class='tipo-badge {tipo_classe}'>{tipo_questao}</span>", unsafe_allow_html=True)
+        with col_dif:
+            st.markdown(f"<span class='dificuldade-badge {dif_classe}'>{dif_label}</span>", unsafe_allow_html=True)
+
+        if tags_list:
+            st.caption(f"Tags: {', '.join(tags_list)}")
+
+        st.caption(f"📌 Origem: {q_fonte}")
+        st.markdown(f"#### {q_enun}")
+
+        is_certo_errado = "Certo/Errado" in q_formato
+
+        if is_certo_errado:
+            opcoes = ["Selecionar...", "Certo", "Errado"]
+        else:
+            opcoes = ["Selecionar..."] + [f"{letra}) {texto}" for letra, texto in alts.items()] if alts else ["Selecionar...", "A", "B", "C", "D", "E"]
+
+        if q_id in respondidas:
+            resposta_usuario_salva = extrair_letra_opcao(respondidas[q_id]['resposta_usuario'], not is_certo_errado)
+            analise_html, exp_geral = montar_analise_html(
+                q_id, resposta_usuario_salva, bool(respondidas[q_id]['acertou']), opcoes[1:], q_gab_normalizado, q_exp, is_certo_errado
+            )
+            st.markdown(analise_html, unsafe_allow_html=True)
+
+            st.write("<br>", unsafe_allow_html=True)
+            with st.expander("📖 Fundamentação Legal Geral"):
+                st.write(exp_geral)
+
+        elif modo_folha:
+            st.write("")
+            marcada = st.session_state.folha_respostas.get(q_id)
+            st.radio(
+                "Sua Resposta:", opcoes, key=f"folha_{q_id}", label_visibility="collapsed",
+                index=opcoes.index(marcada) if marcada in opcoes else 0
+            )
+
+        else:
+            st.write("")
+            resp = st.radio("Sua Resposta:", opcoes, key=f"rad_{q_id}", label_visibility="collapsed")
+            if st.button("Confirmar Resposta", key=f"btn_{q_id}"):
+                if resp != "Selecionar...":
+                    letra_escolhida = extrair_letra_opcao(resp, not is_certo_errado)
+                    acertou = 1 if letra_escolhida == q_gab_normalizado else 0
+
+                    c.execute("""
+                    INSERT INTO respostas (usuario_id, questao_id, resposta_usuario, acertou, data)
+                    VALUES (?, ?, ?, ?, ?)
+                    """, (st.session_state.usuario_id, q_id, letra_escolhida, acertou, str(datetime.now())))
+                    conn.commit()
+                    st.rerun()
+                else:
+                    st.warning("Selecione uma opção.")
+
+# ================= PAINEL DE DESEMPENHO =================
+def formatar_tabela_desempenho(tabela):
+    tabela = tabela.reset_index().rename(columns={
+        "materia": "Matéria", "tema": "Tema", "dificuldade": "Dificuldade",
+        "tentativas": "Respondidas", "acertos": "Acertos", "taxa_acerto": "Aproveitamento (%)",
+    })
+    tabela["Aproveitamento (%)"] = (tabela["Aproveitamento (%)"] * 100).round(1)
+    return tabela.drop(columns=["taxa_ajustada"], errors="ignore")
+
+def renderizar_painel_desempenho(snapshot):
+    if snapshot.dados.empty:
+        st.info("Responda algumas questões para ver a análise de desempenho.")
+        return
+    resultados = snapshot.resultados()
+
+    st.subheader("📈 Evolução do Aproveitamento")
+    st.caption(f"Média móvel de {JANELA_MOVEL_DIAS} dias (%)")
+    st.line_chart(resultados["evolucao"]["taxa_acerto"] * 100)
+
+    col_mat, col_dif = st.columns(2)
+    with col_mat:
+        st.subheader("📚 Por Matéria")
+        st.dataframe(formatar_tabela_desempenho(resultados["por_materia"]), hide_index=True, use_container_width=True)
+    with col_dif:
+        st.subheader("🎚️ Por Dificuldade")
+        st.dataframe(formatar_tabela_desempenho(resultados["por_dificuldade"]), hide_index=True, use_container_width=True)
+
+    st.subheader("🎯 Pontos Fracos")
+    st.caption("Temas com menor aproveitamento, ajustado pelo número de respostas. Use-os no modo Revisão.")
+    st.dataframe(formatar_tabela_desempenho(resultados["pontos_fracos"]), hide_index=True, use_container_width=True)
+
+    with st.expander("Aproveitamento por Tema"):
+        st.dataframe(formatar_tabela_desempenho(resultados["por_tema"]), hide_index=True, use_container_width=True)
 
 # ================= BARRA LATERAL =================
 with st.sidebar:
     st.title("👤 Identificação")
-    df_users = pd.read_sql_query("SELECT nome FROM usuarios", conn)
-    lista_users = df_users['nome'].tolist()
+    usuarios = listar_usuarios(versao_tabela("usuarios"))
 
-    usuario_selecionado = st.selectbox("Selecione o Perfil", ["Novo Usuário..."] + lista_users)
+    usuario_selecionado = st.selectbox("Selecione o Perfil", ["Novo Usuário..."] + list(usuarios))
 
     if usuario_selecionado == "Novo Usuário...":
         novo_nome = st.text_input("Digite o Nome/Login:")
         if st.button("Criar e Entrar", use_container_width=True) and novo_nome:
             try:
-                c.execute("INSERT INTO usuarios (nome) VALUES (?)", (novo_nome.strip(),))
-                conn.commit()
+                st.session_state.usuario_id = cadastrar_usuario(conn, novo_nome)
+                invalidar_tabela("usuarios")
                 st.session_state.usuario_atual = novo_nome.strip()
                 st.success(f"Bem-vindo, {novo_nome}!")
                 st.rerun()
@@ -515,38 +780,63 @@ with st.sidebar:
                 st.error("Este nome já existe.")
     else:
         st.session_state.usuario_atual = usuario_selecionado
+        st.session_state.usuario_id = usuarios[usuario_selecionado]
 
     st.divider()
 
     st.header("🧠 Motor de Inteligência")
+    motores = [
+        ("Automático (Mais Rápido no Momento)", None, "Usa o provedor mais rápido e aciona o outro se demorar"),
+        ("Groq (Gratuito / Llama 3)", "Groq", "Cota diária limitada"),
+        ("DeepSeek (Premium / Custo Otimizado)", "DeepSeek", "Ilimitado sob demanda"),
+        ("Local (Servidor Próprio)", "Local", "Custo fixo, sem cota externa"),
+    ]
+    provedores_ativos = roteador_ia.provedores if roteador_ia else {}
+    resumo_ia = roteador_ia.resumo() if roteador_ia else {}
+    motores = [motor for motor in motores if motor[1] is None or motor[1] in provedores_ativos]
     motor_escolhido = st.radio(
         "Escolha a IA para gerar as questões:",
-        ["Groq (Gratuito / Llama 3)", "DeepSeek (Premium / Custo Otimizado)"],
-        captions=["Cota diária limitada", "Ilimitado sob demanda"]
+        [rotulo for rotulo, _, _ in motores],
+        captions=[legenda for _, _, legenda in motores]
     )
+    motor_preferido = next(nome for rotulo, nome, _ in motores if rotulo == motor_escolhido)
+    latencias = [
+        f"{nome}: {dados['latencia']:.1f}s" + ("" if dados['saudavel'] else " ⚠️")
+        for nome, dados in resumo_ia.items() if dados['latencia'] is not None
+    ]
+    if latencias:
+        st.caption("⏱️ Latência média: " + " | ".join(latencias))
+    uso_cache = []
+    for nome, dados in resumo_ia.items():
+        if dados['taxa_cache'] is None:
+            continue
+        texto = f"{nome}: {dados['taxa_cache']:.0%} da entrada"
+        sem_cache = dados['chamadas'] - dados['chamadas_com_cache']
+        if dados['chamadas_com_cache'] and sem_cache:
+            texto += f" ({dados['segundos_com_cache'] / dados['chamadas_com_cache']:.1f}s com cache x {dados['segundos_sem_cache'] / sem_cache:.1f}s sem)"
+        uso_cache.append(texto)
+    if uso_cache:
+        st.caption("🧊 Cache de prompt: " + " | ".join(uso_cache))
     st.divider()
 
     if st.session_state.usuario_atual:
         st.header("📚 Biblioteca de Editais")
-        df_editais = pd.read_sql_query(
-            "SELECT id, nome_concurso, banca, cargo, dados_json, nivel_dificuldade FROM editais_salvos WHERE usuario = ? ORDER BY id DESC",
-            conn, params=(st.session_state.usuario_atual,)
-        )
+        editais = listar_editais(st.session_state.usuario_id, versao_tabela("editais_salvos"))
 
-        if not df_editais.empty:
-            opcoes_editais = ["Selecione um edital..."] + [f"{row['nome_concurso']} ({row['cargo']})" for _, row in df_editais.iterrows()]
+        if editais:
+            opcoes_editais = ["Selecione um edital..."] + [f"{edital['nome_concurso']} ({edital['cargo']})" for edital in editais]
             escolha = st.selectbox("Carregar Edital Salvo:", opcoes_editais)
 
             if escolha != "Selecione um edital...":
                 idx_selecionado = opcoes_editais.index(escolha) - 1
-                linha_selecionada = df_editais.iloc[idx_selecionado]
+                linha_selecionada = editais[idx_selecionado]
                 perfil_cargo_detectado = obter_perfil_cargo(linha_selecionada['cargo'])
                 perfil_banca_detectada = obter_perfil_banca(linha_selecionada['banca'])
                 st.session_state.edital_ativo = {
                     "nome_concurso": linha_selecionada['nome_concurso'],
                     "banca": linha_selecionada['banca'],
                     "cargo": linha_selecionada['cargo'],
-                    "materias": json.loads(linha_selecionada['dados_json'])['materias'],
+                    "materias": linha_selecionada['materias'],
                     "nivel_dificuldade": perfil_cargo_detectado["nível"],
                     "formatos": perfil_banca_detectada["formatos"]
                 }
@@ -555,47 +845,46 @@ with st.sidebar:
             st.info("A biblioteca está vazia. Adicione um edital abaixo.")
 
         st.write("---")
-        with st.expander("➕ Cadastrar Novo Edital", expanded=True if df_editais.empty else False):
+        with st.expander("➕ Cadastrar Novo Edital", expanded=not editais):
             nome_novo = st.text_input("Nome do Concurso (Ex: PCDF):")
             banca_nova = st.text_input("Banca Examinadora (Ex: Consulpam, Cebraspe):")
             cargo_novo = st.text_input("Cargo:")
             texto_colado = st.text_area("Cole o texto do Conteúdo Programático:")
 
             if st.button("Salvar Edital no Perfil", use_container_width=True) and nome_novo and texto_colado:
-                with st.spinner("Estruturando matérias e detectando formato da banca..."):
-                    perfil_cargo = obter_perfil_cargo(cargo_novo)
-                    perfil_banca = obter_perfil_banca(banca_nova)
-
-                    prompt = f"""
-                    Leia o texto abaixo e liste APENAS as disciplinas/matérias.
-                    Responda em JSON: {{"materias": ["Disc 1", "Disc 2"]}}.
-                    Texto: {texto_colado[:10000]}
-                    """
-                    try:
-                        resposta = client_groq.chat.completions.create(
-                            messages=[{"role": "user", "content": prompt}],
-                            model="llama-3.3-70b-versatile",
-                            temperature=0.1,
-                            response_format={"type": "json_object"}
-                        )
-                        texto_json = resposta.choices[0].message.content
-                        formatos_json = json.dumps(perfil_banca["formatos"])
-
-                        c.execute("""
-                        INSERT INTO editais_salvos (usuario, nome_concurso, banca, cargo, dados_json, data_analise, nivel_dificuldade, formato_questoes)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (st.session_state.usuario_atual, nome_novo, banca_nova, cargo_novo, texto_json, str(datetime.now()), perfil_cargo["nível"], formatos_json))
-                        conn.commit()
-                        st.success(f"✅ Edital salvo! Formato detectado: {perfil_banca['formatos'][0]}")
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Erro ao estruturar: {e}")
+                if roteador_ia is None:
+                    st.error(AVISO_SEM_IA)
+                else:
+                    with st.spinner("Estruturando matérias e detectando formato da banca..."):
+                        perfil_cargo = obter_perfil_cargo(cargo_novo)
+                        perfil_banca = obter_perfil_banca(banca_nova)
+
+                        prompt = f"""
+                        Leia o texto abaixo e liste APENAS as disciplinas/matérias.
+                        Responda em JSON: {{"materias": ["Disc 1", "Disc 2"]}}.
+                        Texto: {texto_colado[:10000]}
+                        """
+                        try:
+                            resposta, _ = roteador_ia.gerar([{"role": "user", "content": prompt}], 0.1, preferido="Groq")
+                            texto_json = resposta.choices[0].message.content
+                            formatos_json = json.dumps(perfil_banca["formatos"])
+
+                            c.execute("""
+                            INSERT INTO editais_salvos (usuario_id, nome_concurso, banca, cargo, dados_json, data_analise, nivel_dificuldade, formato_questoes)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                            """, (st.session_state.usuario_id, nome_novo, banca_nova, cargo_novo, texto_json, str(datetime.now()), perfil_cargo["nível"], formatos_json))
+                            conn.commit()
+                            invalidar_tabela("editais_salvos")
+                            st.success(f"✅ Edital salvo! Formato detectado: {perfil_banca['formatos'][0]}")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Erro ao estruturar: {e}")
 
         st.divider()
         if st.button("Zerar Progresso de Resoluções", use_container_width=True):
-            c.execute("DELETE FROM respostas WHERE usuario = ?", (st.session_state.usuario_atual,))
-            conn.commit()
-            st.session_state.bateria_atual = []
+            apagar_historico_usuario(NOME_BANCO, st.session_state.usuario_id, ARQUIVO_RESPOSTAS)
+            invalidar_tabela("respostas")
+            iniciar_bateria([])
             st.success("O histórico foi apagado!")
             st.rerun()
 
@@ -607,10 +896,12 @@ else:
     st.title(f"📚 Plataforma de Resolução - {st.session_state.usuario_atual}")
     st.write("---")
 
-    df_resp = pd.read_sql_query("SELECT * FROM respostas WHERE usuario = ?", conn, params=(st.session_state.usuario_atual,))
-    total_resp = len(df_resp)
-    taxa_acerto = round((df_resp["acertou"].sum() / total_resp) * 100, 1) if total_resp > 0 else 0
-    acertos = df_resp["acertou"].sum() if total_resp > 0 else 0
+    c.execute(
+        "SELECT COALESCE(SUM(tentativas), 0), COALESCE(SUM(acertos), 0) FROM respostas_consolidadas WHERE usuario_id = ?",
+        (st.session_state.usuario_id,)
+    )
+    total_resp, acertos = c.fetchone()
+    taxa_acerto = round((acertos / total_resp) * 100, 1) if total_resp > 0 else 0
 
     colA, colB, colC = st.columns(3)
     with colA: st.markdown(f'<div class="metric-box"><div class="metric-title">Itens Resolvidos</div><div class="metric-value">{total_resp}</div></div>', unsafe_allow_html=True)
@@ -619,358 +910,333 @@ else:
 
     st.write("<br>", unsafe_allow_html=True)
 
-    with st.container(border=True):
-        st.subheader("⚡ Gerar Bateria de Simulado")
-
-        if st.session_state.edital_ativo:
-            e = st.session_state.edital_ativo
-            banca_alvo = e['banca']
-            cargo_alvo = e['cargo']
-            nivel_dificuldade_auto = e.get('nivel_dificuldade', 3)
-            formatos_banca = e.get('formatos', ["Múltipla Escolha (A a E)"])
-            perfil_cargo = obter_perfil_cargo(cargo_alvo)
-
-            st.markdown(f"<div class='banca-info'>🏢 <b>BANCA DETECTADA:</b> {banca_alvo} | <b>FORMATO:</b> {formatos_banca[0]} | <b>CARGO:</b> {cargo_alvo} | <b>NÍVEL:</b> {perfil_cargo['descrição']}</div>", unsafe_allow_html=True)
-
-            lista_materias = ["Aleatório"] + e['materias']
-            c1, c2 = st.columns(2)
-            with c1: mat_selecionada = st.selectbox("Escolha a Matéria", lista_materias)
-            with c2: tema_selecionado = st.text_input("Tema específico (ou deixe Aleatório)", "Aleatório")
-        else:
-            st.warning("⚠️ Carregue um edital na barra lateral para usar a configuração automática.")
-            c1, c2, c3 = st.columns(3)
-            with c1: banca_alvo = st.text_input("Banca", "Cebraspe")
-            with c2: cargo_alvo = st.text_input("Cargo", "Delegado")
-            with c3: mat_selecionada = st.text_input("Matéria", "Direito Penal")
-            tema_selecionado = st.text_input("Tema específico", "Aleatório")
-            nivel_dificuldade_auto = 3
-
-        c3, c4 = st.columns(2)
-        with c3:
-            tipo = st.selectbox("Origem do Material", [
-                "🧠 Inédita IA (Questões Criadas)",
-                "🌐 Questões Reais (Provas Anteriores)",
-                "📂 Revisão (Focada nos Erros do Banco)"
-            ])
-        with c4:
-            qtd = st.slider("Quantidade", 1, 10, 5)
-
-        usar_web = st.checkbox("🌐 Usar Pesquisa na Web (busca questões similares da banca)", value=True)
-
-        if st.button("Forjar Simulado", type="primary", use_container_width=True):
-            mat_final = random.choice(e['materias']) if mat_selecionada == "Aleatório" and st.session_state.edital_ativo else mat_selecionada
-            instrucao_tema = f"Sorteie um tema complexo em {mat_final}" if tema_selecionado.lower() == "aleatório" else tema_selecionado
-
-            if "Revisão" in tipo:
-                st.info("🔄 Resgatando questões (priorizando as que você errou)...")
-                # QUERY OTIMIZADA PARA FOCAR NOS ERROS E DAR VARIEDADE
-                query_revisao = """
-                    SELECT q.id 
-                    FROM questoes q
-                    LEFT JOIN respostas r ON q.id = r.questao_id AND r.usuario = ?
-                    WHERE (q.banca LIKE ? OR q.cargo LIKE ? OR q.materia LIKE ?)
-                    ORDER BY 
-                        CASE WHEN r.acertou = 0 THEN 1 ELSE 2 END,
-                        RANDOM() 
-                    LIMIT ?
-                """
-                c.execute(query_revisao, (st.session_state.usuario_atual, f"%{banca_alvo}%", f"%{cargo_alvo}%", f"%{mat_final}%", qtd))
-                encontradas = [row[0] for row in c.fetchall()]
-                if encontradas:
-                    st.session_state.bateria_atual = encontradas
-                    st.rerun()
-                else:
-                    st.warning("Banco local insuficiente. Gere material Inédito ou Real primeiro!")
-
-            elif "Inédita" in tipo:
-                with st.spinner(f"🔍 Analisando padrão da banca {banca_alvo}..."):
-                    contexto_jurisprudencia = ""
-                    contexto_estilo = ""
-
-                    if usar_web:
-                        with st.spinner("⚖️ Buscando jurisprudência..."):
-                            contexto_jurisprudencia = pesquisar_jurisprudencia_banca(banca_alvo, cargo_alvo, mat_final)
-                        with st.spinner("🎯 Analisando estilo da banca..."):
-                            contexto_estilo = pesquisar_estilo_questoes_banca(banca_alvo)
-                    else:
-                        contexto_jurisprudencia = "Usando jurisprudência consolidada de memória"
-                        contexto_estilo = "Usando padrão conhecido da banca"
+    desempenho = carregar_desempenho(st.session_state.usuario_id)
+    aba_simulado, aba_desempenho = st.tabs(["🎯 Simulado", "📊 Desempenho"])
 
-                    prompt = gerar_prompt_questoes_ineditas(
-                        qtd, banca_alvo, cargo_alvo, mat_final, instrucao_tema,
-                        contexto_jurisprudencia, contexto_estilo
-                    )
+    with aba_simulado:
+        with st.container(border=True):
+            st.subheader("⚡ Gerar Bateria de Simulado")
 
-                    with st.spinner(f"🚀 Criando {qtd} questões INÉDITAS no estilo {banca_alvo}..."):
-                        try:
-                            if "Groq" in motor_escolhido:
-                                resposta = client_groq.chat.completions.create(
-                                    messages=[{"role": "user", "content": prompt}],
-                                    model="llama-3.3-70b-versatile",
-                                    temperature=0.7,
-                                    response_format={"type": "json_object"}
-                                )
-                            else:
-                                resposta = client_deepseek.chat.completions.create(
-                                    messages=[{"role": "user", "content": prompt}],
-                                    model="deepseek-chat",
-                                    temperature=0.7,
-                                    response_format={"type": "json_object"},
-                                    max_tokens=4000
-                                )
+            if st.session_state.edital_ativo:
+                e = st.session_state.edital_ativo
+                banca_alvo = e['banca']
+                cargo_alvo = e['cargo']
+                nivel_dificuldade_auto = e.get('nivel_dificuldade', 3)
+                formatos_banca = e.get('formatos', ["Múltipla Escolha (A a E)"])
+                perfil_cargo = obter_perfil_cargo(cargo_alvo)
+
+                st.markdown(f"<div class='banca-info'>🏢 <b>BANCA DETECTADA:</b> {banca_alvo} | <b>FORMATO:</b> {formatos_banca[0]} | <b>CARGO:</b> {cargo_alvo} | <b>NÍVEL:</b> {perfil_cargo['descrição']}</div>", unsafe_allow_html=True)
+
+                lista_materias = ["Aleatório"] + e['materias']
+                c1, c2 = st.columns(2)
+                with c1: mat_selecionada = st.selectbox("Escolha a Matéria", lista_materias)
+                with c2: tema_selecionado = st.text_input("Tema específico (ou deixe Aleatório)", "Aleatório")
+            else:
+                st.warning("⚠️ Carregue um edital na barra lateral para usar a configuração automática.")
+                c1, c2, c3 = st.columns(3)
+                with c1: banca_alvo = st.text_input("Banca", "Cebraspe")
+                with c2: cargo_alvo = st.text_input("Cargo", "Delegado")
+                with c3: mat_selecionada = st.text_input("Matéria", "Direito Penal")
+                tema_selecionado = st.text_input("Tema específico", "Aleatório")
+                nivel_dificuldade_auto = 3
+
+            c3, c4 = st.columns(2)
+            with c3:
+                tipo = st.selectbox("Origem do Material", [
+                    "🧠 Inédita IA (Questões Criadas)",
+                    "🌐 Questões Reais (Provas Anteriores)",
+                    "📂 Revisão (Focada nos Erros do Banco)"
+                ])
+            with c4:
+                qtd = st.slider("Quantidade", 1, 10, 5)
+
+            usar_web = st.checkbox("🌐 Usar Pesquisa na Web (busca questões similares da banca)", value=True)
+
+            foco_revisao = None
+            if "Revisão" in tipo and not desempenho.dados.empty:
+                pontos_fracos = desempenho.resultados()["pontos_fracos"]
+                opcoes_foco = [None] + list(pontos_fracos.index)
+                foco_revisao = st.selectbox(
+                    "Foco da Revisão", opcoes_foco,
+                    format_func=lambda foco: "Erros gerais (banca/cargo/matéria atuais)" if foco is None
+                    else f"{foco[0]} › {foco[1]} ({pontos_fracos.loc[foco, 'taxa_acerto']:.0%} de acerto)"
+                )
+
+            if st.button("Forjar Simulado", type="primary", use_container_width=True):
+                mat_final = random.choice(e['materias']) if mat_selecionada == "Aleatório" and st.session_state.edital_ativo else mat_selecionada
+                instrucao_tema = f"Sorteie um tema complexo em {mat_final}" if tema_selecionado.lower() == "aleatório" else tema_selecionado
+
+                if "Revisão" in tipo:
+                    st.info("🔄 Resgatando questões (priorizando as que você errou)...")
+                    # QUERY OTIMIZADA PARA FOCAR NOS ERROS E DAR VARIEDADE
+                    if foco_revisao:
+                        filtro_revisao = "q.materia_id = ? AND q.tema = ?"
+                        params_filtro = (buscar_id_cadastro(conn, "materias", foco_revisao[0]), foco_revisao[1])
+                    else:
+                        filtro_revisao = "(q.banca_id = ? OR q.cargo_id = ? OR q.materia_id = ?)"
+                        params_filtro = (
+                            buscar_id_cadastro(conn, "bancas", banca_alvo),
+                            buscar_id_cadastro(conn, "cargos", cargo_alvo),
+                            buscar_id_cadastro(conn, "materias", mat_final),
+                        )
+                    query_revisao = f"""
+                        SELECT q.id 
+                        FROM questoes q
+                        LEFT JOIN respostas_consolidadas r ON q.id = r.questao_id AND r.usuario_id = ?
+                        WHERE {filtro_revisao}
+                        ORDER BY 
+                            CASE WHEN r.acertou = 0 THEN 1 ELSE 2 END,
+                            RANDOM() 
+                        LIMIT ?
+                    """
+                    c.execute(query_revisao, (st.session_state.usuario_id, *params_filtro, qtd))
+                    encontradas = [row[0] for row in c.fetchall()]
+                    if encontradas:
+                        iniciar_bateria(encontradas)
+                        st.rerun()
+                    else:
+                        st.warning("Banco local insuficiente. Gere material Inédito ou Real primeiro!")
+
+                elif roteador_ia is None:
+                    st.error(AVISO_SEM_IA)
+
+                elif "Inédita" in tipo:
+                    with st.spinner(f"🔍 Analisando padrão da banca {banca_alvo}..."):
+                        contexto_jurisprudencia = ""
+                        contexto_estilo = ""
+                        exemplos_locais, cobertura_local = buscar_questoes_reais_locais(banca_alvo, cargo_alvo, mat_final, tema_selecionado)
+
+                        if cobertura_local >= COBERTURA_MINIMA_LOCAL:
+                            st.info(f"📂 {cobertura_local} questões reais do tema já estão no banco local. Pesquisa na web dispensada.")
+                            contexto_jurisprudencia = montar_fundamentacao_local(exemplos_locais)
+                            contexto_estilo = montar_contexto_local(exemplos_locais)
+                        elif usar_web:
+                            with st.spinner("⚖️ Buscando jurisprudência..."):
+                                contexto_jurisprudencia = pesquisar_jurisprudencia_banca(banca_alvo, cargo_alvo, mat_final)
+                            with st.spinner("🎯 Analisando estilo da banca..."):
+                                contexto_estilo = pesquisar_estilo_questoes_banca(banca_alvo)
+                            if exemplos_locais:
+                                contexto_estilo = montar_contexto_local(exemplos_locais) + "\n---\n" + contexto_estilo
+                        elif exemplos_locais:
+                            contexto_jurisprudencia = montar_fundamentacao_local(exemplos_locais) or "Usando jurisprudência consolidada de memória"
+                            contexto_estilo = montar_contexto_local(exemplos_locais)
+                        else:
+                            contexto_jurisprudencia = "Usando jurisprudência consolidada de memória"
+                            contexto_estilo = "Usando padrão conhecido da banca"
+
+                        mensagens = gerar_prompt_questoes_ineditas(
+                            qtd, banca_alvo, cargo_alvo, mat_final, instrucao_tema,
+                            contexto_jurisprudencia, contexto_estilo
+                        )
 
-                            conteudo = resposta.choices[0].message.content
+                        with st.spinner(f"🚀 Criando {qtd} questões INÉDITAS no estilo {banca_alvo}..."):
+                            try:
+                                resposta, provedor_usado = roteador_ia.gerar(mensagens, 0.7, preferido=motor_preferido)
+
+                                conteudo = resposta.choices[0].message.content
                             
-                            # EXTRATOR DE JSON BLINDADO (Remove sujeiras do Llama3)
-                            match = re.search(r'\{.*\}', conteudo, re.DOTALL)
-                            if match:
-                                conteudo_limpo = match.group(0)
-                            else:
-                                conteudo_limpo = conteudo
+                                # EXTRATOR DE JSON BLINDADO (Remove sujeiras do Llama3)
+                                match = re.search(r'\{.*\}', conteudo, re.DOTALL)
+                                if match:
+                                    conteudo_limpo = match.group(0)
+                                else:
+                                    conteudo_limpo = conteudo
                                 
-                            dados_json = json.loads(conteudo_limpo.replace("```json", "").replace("```", "").strip())
-                            lista_questoes = dados_json.get("questoes", [])
-                            if not lista_questoes and isinstance(dados_json, list):
-                                lista_questoes = dados_json
-
-                            novas_ids = []
-                            duplicatas_encontradas = 0
-
-                            for dados in lista_questoes:
-                                enunciado = dados.get("enunciado", "N/A")
-                                gabarito = normalizar_gabarito(dados.get("gabarito", "N/A"))
-
-                                if questao_ja_existe(enunciado, gabarito):
-                                    duplicatas_encontradas += 1
-                                    continue
-
-                                fonte = dados.get("fonte", f"Inédita IA - {banca_alvo}")
-                                dificuldade = dados.get("dificuldade", nivel_dificuldade_auto)
-                                tags = json.dumps(dados.get("tags", []))
-                                formato_questao = dados.get("formato", "Múltipla Escolha")
-                                alts_dict = dados.get("alternativas", {})
-                                hash_q = gerar_hash_questao(enunciado, gabarito)
-
-                                alternativas = json.dumps(alts_dict)
-                                explicacao_texto = dados.get("explicacao", "N/A")
-                                comentarios_dict = dados.get("comentarios", {})
-                                explicacao_final = json.dumps({"geral": explicacao_texto, "detalhes": comentarios_dict})
-
-                                c.execute("""
-                                INSERT INTO questoes (banca, cargo, materia, tema, enunciado, alternativas, gabarito, explicacao, tipo, fonte, dificuldade, tags, formato_questao, eh_real, hash_questao)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                """, (banca_alvo, cargo_alvo, mat_final, tema_selecionado, enunciado, alternativas, gabarito, explicacao_final, tipo, fonte, dificuldade, tags, formato_questao, 0, hash_q))
-                                novas_ids.append(c.lastrowid)
+                                dados_json = json.loads(conteudo_limpo.replace("```json", "").replace("```", "").strip())
+                                lista_questoes = decodificar_questoes(dados_json, TIPO_INEDITAS, campos_fixos_questoes(TIPO_INEDITAS, banca_alvo, cargo_alvo))
+
+                                novas_ids = []
+                                duplicatas_encontradas = 0
+                                banca_id, cargo_id, materia_id = ids_cadastro(banca_alvo, cargo_alvo, mat_final)
+
+                                for dados in lista_questoes:
+                                    enunciado = dados.get("enunciado", "N/A")
+                                    gabarito = normalizar_gabarito(dados.get("gabarito", "N/A"))
+
+                                    if questao_ja_existe(enunciado, gabarito):
+                                        duplicatas_encontradas += 1
+                                        continue
+
+                                    fonte = dados.get("fonte", f"Inédita IA - {banca_alvo}")
+                                    dificuldade = dados.get("dificuldade", nivel_dificuldade_auto)
+                                    tags = codec.comprimir(json.dumps(dados.get("tags", [])))
+                                    formato_questao = dados.get("formato", "Múltipla Escolha")
+                                    alts_dict = dados.get("alternativas", {})
+                                    hash_q = gerar_hash_questao(enunciado, gabarito)
+
+                                    alternativas = codec.comprimir(json.dumps(alts_dict))
+                                    explicacao_texto = dados.get("explicacao", "N/A")
+                                    comentarios_dict = dados.get("comentarios", {})
+                                    explicacao_final = codec.comprimir(json.dumps({"geral": explicacao_texto, "detalhes": comentarios_dict}))
+
+                                    c.execute("""
+                                    INSERT INTO questoes (banca_id, cargo_id, materia_id, tema, enunciado, alternativas, gabarito, explicacao, tipo, fonte, dificuldade, tags, formato_questao, eh_real, hash_questao)
+                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                    """, (banca_id, cargo_id, materia_id, tema_selecionado, enunciado, alternativas, gabarito, explicacao_final, tipo, fonte, dificuldade, tags, formato_questao, 0, hash_q))
+                                    novas_ids.append(c.lastrowid)
 
-                            conn.commit()
-                            st.session_state.bateria_atual = novas_ids
-                            if duplicatas_encontradas > 0:
-                                st.warning(f"⚠️ {duplicatas_encontradas} questões duplicadas descartadas.")
-                            st.success(f"✅ {len(novas_ids)} questões INÉDITAS geradas!")
-                            st.rerun()
-
-                        except Exception as e:
-                            if "rate_limit" in str(e).lower() or "429" in str(e):
-                                st.error("⚠️ **Limite diário do Groq atingido!** Use o motor **DeepSeek**.")
-                            else:
-                                st.error(f"❌ Erro na geração: {e}")
+                                conn.commit()
+                                iniciar_bateria(novas_ids)
+                                if duplicatas_encontradas > 0:
+                                    st.warning(f"⚠️ {duplicatas_encontradas} questões duplicadas descartadas.")
+                                st.success(f"✅ {len(novas_ids)} questões INÉDITAS geradas! (via {provedor_usado})")
+                                st.rerun()
 
-            else:
-                with st.spinner(f"📚 Buscando questões REAIS de provas anteriores da {banca_alvo}..."):
-                    contexto_reais = ""
-                    if usar_web:
-                        with st.spinner("🔍 Pesquisando provas anteriores..."):
-                            contexto_reais = pesquisar_questoes_reais_banca(banca_alvo, cargo_alvo, mat_final, tema_selecionado, qtd)
-                    else:
-                        contexto_reais = "Buscando em memória de provas conhecidas"
+                            except Exception as e:
+                                if "rate_limit" in str(e).lower() or "429" in str(e):
+                                    st.error("⚠️ **Limite de requisições atingido nos provedores disponíveis!** Tente novamente mais tarde.")
+                                else:
+                                    st.error(f"❌ Erro na geração: {e}")
 
-                    prompt = gerar_prompt_questoes_reais(
-                        qtd, banca_alvo, cargo_alvo, mat_final, instrucao_tema, contexto_reais
-                    )
+                else:
+                    with st.spinner(f"📚 Buscando questões REAIS de provas anteriores da {banca_alvo}..."):
+                        contexto_reais = ""
+                        exemplos_locais, _ = buscar_questoes_reais_locais(banca_alvo, cargo_alvo, mat_final, tema_selecionado)
+                        contexto_local = ""
+                        if exemplos_locais:
+                            contexto_local = "QUESTÕES REAIS JÁ CADASTRADAS (referência de estilo; NÃO as repita):\n" + montar_contexto_local(exemplos_locais)
+
+                        if usar_web:
+                            with st.spinner("🔍 Pesquisando provas anteriores..."):
+                                contexto_reais = pesquisar_questoes_reais_banca(banca_alvo, cargo_alvo, mat_final, tema_selecionado, qtd)
+                            if contexto_local:
+                                contexto_reais = contexto_local + "\n---\n" + contexto_reais
+                        elif contexto_local:
+                            contexto_reais = contexto_local
+                        else:
+                            contexto_reais = "Buscando em memória de provas conhecidas"
+
+                        mensagens = gerar_prompt_questoes_reais(
+                            qtd, banca_alvo, cargo_alvo, mat_final, instrucao_tema, contexto_reais
+                        )
 
-                    with st.spinner(f"📋 Transcrevendo {qtd} questões REAIS de provas anteriores..."):
-                        try:
-                            if "Groq" in motor_escolhido:
-                                resposta = client_groq.chat.completions.create(
-                                    messages=[{"role": "user", "content": prompt}],
-                                    model="llama-3.3-70b-versatile",
-                                    temperature=0.0,
-                                    response_format={"type": "json_object"}
+                        with st.spinner(f"📋 Transcrevendo {qtd} questões REAIS de provas anteriores..."):
+                            try:
+                                # Temperatura 0: pedidos idênticos simultâneos aguardam a mesma chamada
+                                chave_pedido = normalizar_chave(
+                                    "reais", banca_alvo, cargo_alvo, mat_final, tema_selecionado, qtd, motor_preferido,
+                                    assinatura_mensagens(mensagens)
                                 )
-                            else:
-                                resposta = client_deepseek.chat.completions.create(
-                                    messages=[{"role": "user", "content": prompt}],
-                                    model="deepseek-chat",
-                                    temperature=0.0,
-                                    response_format={"type": "json_object"},
-                                    max_tokens=4000
+                                resposta, provedor_usado = VOO_UNICO.executar(
+                                    chave_pedido, roteador_ia.gerar, mensagens, 0.0, preferido=motor_preferido
                                 )
 
-                            conteudo = resposta.choices[0].message.content
+                                conteudo = resposta.choices[0].message.content
                             
-                            # EXTRATOR DE JSON BLINDADO
-                            match = re.search(r'\{.*\}', conteudo, re.DOTALL)
-                            if match:
-                                conteudo_limpo = match.group(0)
-                            else:
-                                conteudo_limpo = conteudo
-
-                            dados_json = json.loads(conteudo_limpo.replace("```json", "").replace("```", "").strip())
-                            lista_questoes = dados_json.get("questoes", [])
-                            if not lista_questoes and isinstance(dados_json, list):
-                                lista_questoes = dados_json
-
-                            novas_ids = []
-                            duplicatas_encontradas = 0
-
-                            for dados in lista_questoes:
-                                enunciado = dados.get("enunciado", "N/A")
-                                gabarito = normalizar_gabarito(dados.get("gabarito", "N/A"))
-
-                                if questao_ja_existe(enunciado, gabarito):
-                                    duplicatas_encontradas += 1
-                                    continue
-
-                                fonte = dados.get("fonte", f"Prova Real - {banca_alvo}")
-                                dificuldade = dados.get("dificuldade", nivel_dificuldade_auto)
-                                tags = json.dumps(dados.get("tags", []))
-                                formato_questao = dados.get("formato", "Múltipla Escolha")
-                                ano_prova = dados.get("ano_prova", 0)
-                                alts_dict = dados.get("alternativas", {})
-                                hash_q = gerar_hash_questao(enunciado, gabarito)
-
-                                alternativas = json.dumps(alts_dict)
-                                explicacao_texto = dados.get("explicacao", "N/A")
-                                comentarios_dict = dados.get("comentarios", {})
-                                explicacao_final = json.dumps({"geral": explicacao_texto, "detalhes": comentarios_dict})
-
-                                c.execute("""
-                                INSERT INTO questoes (banca, cargo, materia, tema, enunciado, alternativas, gabarito, explicacao, tipo, fonte, dificuldade, tags, formato_questao, eh_real, ano_prova, hash_questao)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                """, (banca_alvo, cargo_alvo, mat_final, tema_selecionado, enunciado, alternativas, gabarito, explicacao_final, tipo, fonte, dificuldade, tags, formato_questao, 1, ano_prova, hash_q))
-                                novas_ids.append(c.lastrowid)
+                                # EXTRATOR DE JSON BLINDADO
+                                match = re.search(r'\{.*\}', conteudo, re.DOTALL)
+                                if match:
+                                    conteudo_limpo = match.group(0)
+                                else:
+                                    conteudo_limpo = conteudo
+
+                                dados_json = json.loads(conteudo_limpo.replace("```json", "").replace("```", "").strip())
+                                lista_questoes = decodificar_questoes(dados_json, TIPO_REAIS, campos_fixos_questoes(TIPO_REAIS, banca_alvo, cargo_alvo))
+
+                                novas_ids = []
+                                duplicatas_encontradas = 0
+                                banca_id, cargo_id, materia_id = ids_cadastro(banca_alvo, cargo_alvo, mat_final)
+
+                                for dados in lista_questoes:
+                                    enunciado = dados.get("enunciado", "N/A")
+                                    gabarito = normalizar_gabarito(dados.get("gabarito", "N/A"))
+
+                                    id_existente = obter_id_questao(enunciado, gabarito)
+                                    if id_existente:
+                                        # Já cadastrada (ex.: por outra sessão que pediu o mesmo): entra na bateria assim mesmo
+                                        duplicatas_encontradas += 1
+                                        novas_ids.append(id_existente)
+                                        continue
+
+                                    fonte = dados.get("fonte", f"Prova Real - {banca_alvo}")
+                                    dificuldade = dados.get("dificuldade", nivel_dificuldade_auto)
+                                    tags = codec.comprimir(json.dumps(dados.get("tags", [])))
+                                    formato_questao = dados.get("formato", "Múltipla Escolha")
+                                    ano_prova = dados.get("ano_prova", 0)
+                                    alts_dict = dados.get("alternativas", {})
+                                    hash_q = gerar_hash_questao(enunciado, gabarito)
+
+                                    alternativas = codec.comprimir(json.dumps(alts_dict))
+                                    explicacao_texto = dados.get("explicacao", "N/A")
+                                    comentarios_dict = dados.get("comentarios", {})
+                                    explicacao_final = codec.comprimir(json.dumps({"geral": explicacao_texto, "detalhes": comentarios_dict}))
+
+                                    c.execute("""
+                                    INSERT INTO questoes (banca_id, cargo_id, materia_id, tema, enunciado, alternativas, gabarito, explicacao, tipo, fonte, dificuldade, tags, formato_questao, eh_real, ano_prova, hash_questao)
+                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                    """, (banca_id, cargo_id, materia_id, tema_selecionado, enunciado, alternativas, gabarito, explicacao_final, tipo, fonte, dificuldade, tags, formato_questao, 1, ano_prova, hash_q))
+                                    novas_ids.append(c.lastrowid)
 
-                            conn.commit()
-                            st.session_state.bateria_atual = novas_ids
-                            if duplicatas_encontradas > 0:
-                                st.info(f"ℹ️ {duplicatas_encontradas} questões já estavam no banco.")
-                            st.success(f"✅ {len(novas_ids)} questões REAIS de provas anteriores carregadas!")
-                            st.rerun()
+                                conn.commit()
+                                iniciar_bateria(novas_ids)
+                                if duplicatas_encontradas > 0:
+                                    st.info(f"ℹ️ {duplicatas_encontradas} questões já estavam no banco.")
+                                st.success(f"✅ {len(novas_ids)} questões REAIS de provas anteriores carregadas! (via {provedor_usado})")
+                                st.rerun()
 
-                        except Exception as e:
-                            if "rate_limit" in str(e).lower() or "429" in str(e):
-                                st.error("⚠️ **Limite diário do Groq atingido!** Use o motor **DeepSeek**.")
-                            else:
-                                st.error(f"❌ Erro na transcrição: {e}")
+                            except Exception as e:
+                                if "rate_limit" in str(e).lower() or "429" in str(e):
+                                    st.error("⚠️ **Limite de requisições atingido nos provedores disponíveis!** Tente novamente mais tarde.")
+                                else:
+                                    st.error(f"❌ Erro na transcrição: {e}")
 
-    # ================= RESOLUÇÃO =================
-    if st.session_state.bateria_atual:
-        st.write("---")
-        st.subheader("🎯 Caderno de Prova")
+        # ================= RESOLUÇÃO =================
+        if st.session_state.bateria_atual:
+            st.write("---")
+            st.subheader("🎯 Caderno de Prova")
 
-        ids_str = ','.join(map(str, st.session_state.bateria_atual))
-        df_respostas = pd.read_sql_query(
-            f"SELECT questao_id, resposta_usuario, acertou FROM respostas WHERE usuario = '{st.session_state.usuario_atual}' AND questao_id IN ({ids_str})",
-            conn
-        )
-        respondidas = df_respostas.set_index('questao_id').to_dict('index')
+            bateria = st.session_state.bateria_atual
+            modo_caderno = st.radio(
+                "Modo de exibição:", ["📄 Uma por Página", "📝 Folha de Respostas", "📋 Lista Completa"],
+                horizontal=True, key="modo_caderno", on_change=mudar_modo_caderno
+            )
 
-        for i, q_id in enumerate(st.session_state.bateria_atual):
+            ids_str = ','.join(map(str, bateria))
             c.execute(
-                "SELECT banca, cargo, materia, enunciado, alternativas, gabarito, explicacao, fonte, dificuldade, tags, formato_questao, eh_real FROM questoes WHERE id = ?",
-                (q_id,)
+                f"SELECT questao_id, resposta_usuario, acertou FROM respostas_consolidadas WHERE usuario_id = ? AND questao_id IN ({ids_str}) ORDER BY data",
+                (st.session_state.usuario_id,)
             )
-            dados = c.fetchone()
-
-            if dados:
-                q_banca, q_cargo, q_mat, q_enun, q_alt, q_gab, q_exp, q_fonte, q_dif, q_tags, q_formato, eh_real = dados
-                alts = json.loads(q_alt) if q_alt else {}
-                tags_list = json.loads(q_tags) if q_tags else []
+            respondidas = {q_id: {"resposta_usuario": resposta, "acertou": acertou} for q_id, resposta, acertou in c.fetchall()}
+
+            if "Página" in modo_caderno:
+                total_itens = len(bateria)
+                indice = min(st.session_state.indice_caderno, total_itens - 1)
+                qtd_respondidas = sum(1 for q_id in bateria if q_id in respondidas)
+                st.progress(qtd_respondidas / total_itens, text=f"{qtd_respondidas} de {total_itens} itens respondidos")
+
+                nav_ant, nav_pos, nav_prox = st.columns([1, 2, 1])
+                with nav_ant:
+                    st.button("◀ Anterior", on_click=mudar_pagina_caderno, args=(-1,), disabled=indice == 0, use_container_width=True)
+                with nav_pos:
+                    st.markdown(f"<div style='text-align: center;'><b>Item {indice + 1} de {total_itens}</b></div>", unsafe_allow_html=True)
+                with nav_prox:
+                    st.button("Próxima ▶", on_click=mudar_pagina_caderno, args=(1,), disabled=indice >= total_itens - 1, use_container_width=True)
+
+                renderizar_questao(indice, bateria[indice], respondidas)
+
+            elif "Folha" in modo_caderno:
+                total_itens = len(bateria)
+                indice = min(st.session_state.indice_caderno, total_itens - 1)
+                q_id_atual = bateria[indice]
+                qtd_marcadas = sum(1 for q_id in bateria if q_id in respondidas or q_id in st.session_state.folha_respostas)
+                st.progress(qtd_marcadas / total_itens, text=f"{qtd_marcadas} de {total_itens} itens marcados")
+
+                with st.form("folha_respostas", border=False):
+                    renderizar_questao(indice, q_id_atual, respondidas, modo_folha=True)
+
+                    nav_ant, nav_pos, nav_prox = st.columns([1, 2, 1])
+                    with nav_ant:
+                        st.form_submit_button("◀ Anterior", on_click=registrar_item_folha, args=(q_id_atual, -1), disabled=indice == 0, use_container_width=True)
+                    with nav_pos:
+                        st.markdown(f"<div style='text-align: center;'><b>Item {indice + 1} de {total_itens}</b></div>", unsafe_allow_html=True)
+                    with nav_prox:
+                        st.form_submit_button("Próxima ▶", on_click=registrar_item_folha, args=(q_id_atual, 1), disabled=indice >= total_itens - 1, use_container_width=True)
+
+                    st.form_submit_button("📨 Entregar Folha de Respostas", type="primary", on_click=entregar_folha, args=(q_id_atual,), use_container_width=True)
 
-                q_gab_normalizado = normalizar_gabarito(q_gab)
-
-                dif_label = ["Muito Fácil", "Fácil", "Médio", "Difícil", "Muito Difícil"][min(q_dif - 1, 4)] if q_dif else "Médio"
-                dif_classe = "dif-facil" if q_dif <= 2 else "dif-medio" if q_dif == 3 else "dif-dificil"
-                tipo_questao = "Prova Real" if eh_real else "Inédita IA"
-                tipo_classe = "tipo-real" if eh_real else "tipo-inedita"
-
-                try:
-                    exp_data = json.loads(q_exp)
-                    if isinstance(exp_data, dict) and "geral" in exp_data:
-                        exp_geral = exp_data["geral"]
-                        exp_detalhes = exp_data.get("detalhes", {})
-                    else:
-                        exp_geral = q_exp
-                        exp_detalhes = {}
-                except:
-                    exp_geral = q_exp
-                    exp_detalhes = {}
-
-                with st.container(border=True):
-                    col_info, col_tipo, col_dif = st.columns([3, 1, 1])
-                    with col_info:
-                        st.caption(f"**Item {i+1}** | 🏢 {q_banca} | 📚 {q_mat} | 🎯 {q_formato}")
-                    with col_tipo:
-                        st.markdown(f"<span class='tipo-badge {tipo_classe}'>{tipo_questao}</span>", unsafe_allow_html=True)
-                    with col_dif:
-                        st.markdown(f"<span class='dificuldade-badge {dif_classe}'>{dif_label}</span>", unsafe_allow_html=True)
-
-                    if tags_list:
-                        st.caption(f"Tags: {', '.join(tags_list)}")
-
-                    st.caption(f"📌 Origem: {q_fonte}")
-                    st.markdown(f"#### {q_enun}")
-
-                    is_certo_errado = "Certo/Errado" in q_formato
-
-                    if is_certo_errado:
-                        opcoes = ["Selecionar...", "Certo", "Errado"]
-                    else:
-                        opcoes = ["Selecionar..."] + [f"{letra}) {texto}" for letra, texto in alts.items()] if alts else ["Selecionar...", "A", "B", "C", "D", "E"]
-
-                    if q_id in respondidas:
-                        status = respondidas[q_id]
-                        resposta_usuario_salva = extrair_letra_opcao(status['resposta_usuario'], not is_certo_errado)
-
-                        st.markdown("<br><b>Análise Detalhada das Alternativas:</b>", unsafe_allow_html=True)
-
-                        for opcao in opcoes[1:]:
-                            letra_opcao = extrair_letra_opcao(opcao, not is_certo_errado)
-
-                            is_resposta_usuario = (letra_opcao == resposta_usuario_salva)
-                            is_gabarito = (letra_opcao == q_gab_normalizado)
-
-                            if is_resposta_usuario:
-                                if status['acertou'] == 1:
-                                    st.markdown(f"<div class='alt-correta'>✅ <b>{opcao}</b> (Sua Resposta Correta)</div>", unsafe_allow_html=True)
-                                else:
-                                    st.markdown(f"<div class='alt-errada'>❌ <b>{opcao}</b> (Sua Resposta Incorreta)</div>", unsafe_allow_html=True)
-                            elif is_gabarito and status['acertou'] == 0:
-                                st.markdown(f"<div class='alt-gabarito'>🎯 <b>{opcao}</b> (Gabarito Oficial)</div>", unsafe_allow_html=True)
-                            else:
-                                st.markdown(f"<div class='alt-neutra'>{opcao}</div>", unsafe_allow_html=True)
-
-                            if not is_certo_errado and letra_opcao in exp_detalhes and exp_detalhes[letra_opcao]:
-                                st.markdown(f"<div class='comentario-alt'>💡 <i><b>Por que?</b> {exp_detalhes[letra_opcao]}</i></div>", unsafe_allow_html=True)
-
-                        st.write("<br>", unsafe_allow_html=True)
-                        with st.expander("📖 Fundamentação Legal Geral"):
-                            st.write(exp_geral)
-
-                    else:
-                        st.write("")
-                        resp = st.radio("Sua Resposta:", opcoes, key=f"rad_{q_id}", label_visibility="collapsed")
-                        if st.button("Confirmar Resposta", key=f"btn_{q_id}"):
-                            if resp != "Selecionar...":
-                                letra_escolhida = extrair_letra_opcao(resp, not is_certo_errado)
-                                acertou = 1 if letra_escolhida == q_gab_normalizado else 0
-
-                                c.execute("""
-                                INSERT INTO respostas (usuario, questao_id, resposta_usuario, acertou, data)
-                                VALUES (?, ?, ?, ?, ?)
-                                """, (st.session_state.usuario_atual, q_id, letra_escolhida, acertou, str(datetime.now())))
-                                conn.commit()
-                                st.rerun()
-                            else:
-                                st.warning("Selecione uma opção.")
+            else:
+                for i, q_id in enumerate(bateria):
+                    renderizar_questao(i, q_id, respondidas)
 
+    with aba_desempenho:
+        renderizar_painel_desempenho(desempenho)
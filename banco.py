@@ -0,0 +1,309 @@
+import sqlite3
+import hashlib
+import unicodedata
+
+from compressao import criar_tabela_dicionarios, preparar_codec, recomprimir_questoes
+
+# ================= ESQUEMA DO BANCO =================
+NOME_BANCO = "estudos_multi_user.db"
+VERSAO_ESQUEMA = 4
+
+# Cadastros com chave inteira. `nome` é a grafia exibida (a primeira que chegou);
+# `nome_canonico` é a chave de unicidade, sem acento, caixa ou espaços repetidos.
+# Em `usuarios` a chave é o próprio nome digitado: "Ana" e "ana" são pessoas diferentes.
+TABELAS_CADASTRO = ("usuarios", "bancas", "cargos", "materias")
+USUARIO_SEM_NOME = "(sem usuário)"
+
+DDL_CADASTRO = """
+CREATE TABLE IF NOT EXISTS {tabela} (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    nome_canonico TEXT NOT NULL UNIQUE
+)
+"""
+
+DDL_QUESTOES = """
+CREATE TABLE IF NOT EXISTS {tabela} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    banca_id INTEGER REFERENCES bancas(id),
+    cargo_id INTEGER REFERENCES cargos(id),
+    materia_id INTEGER REFERENCES materias(id),
+    tema TEXT,
+    enunciado TEXT, alternativas TEXT, gabarito TEXT,
+    explicacao TEXT, tipo TEXT, fonte TEXT,
+    dificuldade INTEGER DEFAULT 3, tags TEXT DEFAULT '[]',
+    formato_questao TEXT DEFAULT 'Múltipla Escolha',
+    eh_real INTEGER DEFAULT 0, ano_prova INTEGER DEFAULT 0, hash_questao TEXT DEFAULT ''
+)
+"""
+
+DDL_RESPOSTAS = """
+CREATE TABLE IF NOT EXISTS {tabela} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+    questao_id INTEGER REFERENCES questoes(id),
+    resposta_usuario TEXT, acertou INTEGER, data TEXT, tempo_resposta INTEGER DEFAULT 0
+)
+"""
+
+# Respostas antigas consolidadas pela manutenção (ver manutencao.py)
+DDL_RESPOSTAS_RESUMO = """
+CREATE TABLE IF NOT EXISTS {tabela} (
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+    questao_id INTEGER REFERENCES questoes(id),
+    tentativas INTEGER DEFAULT 0, acertos INTEGER DEFAULT 0,
+    ultima_resposta TEXT, ultimo_acertou INTEGER, ultima_data TEXT,
+    tempo_total INTEGER DEFAULT 0,
+    PRIMARY KEY (usuario_id, questao_id)
+)
+"""
+
+DDL_EDITAIS = """
+CREATE TABLE IF NOT EXISTS {tabela} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+    nome_concurso TEXT, banca TEXT, cargo TEXT,
+    dados_json TEXT, data_analise TEXT, nivel_dificuldade INTEGER DEFAULT 3,
+    formato_questoes TEXT DEFAULT '[]'
+)
+"""
+
+def criar_esquema(conn):
+    for tabela in TABELAS_CADASTRO:
+        conn.execute(DDL_CADASTRO.format(tabela=tabela))
+    conn.execute(DDL_QUESTOES.format(tabela="questoes"))
+    conn.execute(DDL_RESPOSTAS.format(tabela="respostas"))
+    conn.execute(DDL_RESPOSTAS_RESUMO.format(tabela="respostas_resumo"))
+    conn.execute(DDL_EDITAIS.format(tabela="editais_salvos"))
+    criar_tabela_dicionarios(conn)
+    conn.commit()
+
+# Índices, view e FTS dependem das colunas *_id: só são criados depois das migrações
+def criar_indices(conn):
+    c = conn.cursor()
+    c.execute("CREATE INDEX IF NOT EXISTS idx_questoes_hash ON questoes(hash_questao)")
+    # Cobre a contagem de questões reais do contexto local sem ler a tabela
+    c.execute("CREATE INDEX IF NOT EXISTS idx_questoes_reais ON questoes(eh_real, banca_id, materia_id, cargo_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_questoes_banca ON questoes(banca_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_questoes_cargo ON questoes(cargo_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_questoes_materia ON questoes(materia_id, tema)")
+    criar_indice_textual(conn)
+    # Cobre métricas e o filtro de revisão (usuário + questão + acerto)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_respostas_usuario ON respostas(usuario_id, questao_id, acertou)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_respostas_data ON respostas(data)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_respostas_incremental ON respostas(usuario_id, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_editais_usuario ON editais_salvos(usuario_id)")
+    c.execute("""
+    CREATE VIEW IF NOT EXISTS respostas_consolidadas AS
+    SELECT usuario_id, questao_id, resposta_usuario, acertou, data, tempo_resposta,
+           1 AS tentativas, acertou AS acertos
+    FROM respostas
+    UNION ALL
+    SELECT usuario_id, questao_id, ultima_resposta, ultimo_acertou, ultima_data, tempo_total,
+           tentativas, acertos
+    FROM respostas_resumo
+    """)
+    # Leitura com os nomes de exibição (tela da questão, exportação, análise)
+    c.execute("""
+    CREATE VIEW IF NOT EXISTS questoes_nomeadas AS
+    SELECT q.*, b.nome AS banca, cg.nome AS cargo, m.nome AS materia
+    FROM questoes q
+    LEFT JOIN bancas b ON b.id = q.banca_id
+    LEFT JOIN cargos cg ON cg.id = q.cargo_id
+    LEFT JOIN materias m ON m.id = q.materia_id
+    """)
+    conn.commit()
+
+# Índice FTS5 (enunciado + tema) mantido por triggers; usado para achar questões
+# reais parecidas com o pedido sem ir à web. Builds do SQLite sem FTS5 ficam sem ele.
+def criar_indice_textual(conn):
+    try:
+        conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS questoes_fts USING fts5(
+            enunciado, tema, content='questoes', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """)
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS questoes_fts_ai AFTER INSERT ON questoes BEGIN
+        INSERT INTO questoes_fts (rowid, enunciado, tema) VALUES (new.id, new.enunciado, new.tema);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS questoes_fts_ad AFTER DELETE ON questoes BEGIN
+        INSERT INTO questoes_fts (questoes_fts, rowid, enunciado, tema) VALUES ('delete', old.id, old.enunciado, old.tema);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS questoes_fts_au AFTER UPDATE OF enunciado, tema ON questoes BEGIN
+        INSERT INTO questoes_fts (questoes_fts, rowid, enunciado, tema) VALUES ('delete', old.id, old.enunciado, old.tema);
+        INSERT INTO questoes_fts (rowid, enunciado, tema) VALUES (new.id, new.enunciado, new.tema);
+    END
+    """)
+    return True
+
+def tem_indice_textual(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'questoes_fts'").fetchone() is not None
+
+# ================= CADASTROS (USUÁRIOS, BANCAS, CARGOS, MATÉRIAS) =================
+def limpar_nome(nome):
+    return " ".join(str(nome or "").split())
+
+def canonizar_nome(nome):
+    sem_acento = unicodedata.normalize("NFKD", limpar_nome(nome))
+    return "".join(ch for ch in sem_acento if not unicodedata.combining(ch)).casefold()
+
+def chave_cadastro(tabela, nome):
+    if tabela == "usuarios":
+        return str(nome or "").strip()
+    return canonizar_nome(nome)
+
+def buscar_id_cadastro(conn, tabela, nome):
+    linha = conn.execute(f"SELECT id FROM {tabela} WHERE nome_canonico = ?", (chave_cadastro(tabela, nome),)).fetchone()
+    return linha[0] if linha else None
+
+# "Cebraspe", "CEBRASPE" e " cebraspe " caem no mesmo id; a primeira grafia vira a exibida
+def obter_id_cadastro(conn, tabela, nome):
+    chave = chave_cadastro(tabela, nome)
+    if not chave:
+        return None
+    conn.execute(f"INSERT OR IGNORE INTO {tabela} (nome, nome_canonico) VALUES (?, ?)", (limpar_nome(nome), chave))
+    return conn.execute(f"SELECT id FROM {tabela} WHERE nome_canonico = ?", (chave,)).fetchone()[0]
+
+# Levanta sqlite3.IntegrityError se o nome já estiver cadastrado
+def cadastrar_usuario(conn, nome):
+    nome = chave_cadastro("usuarios", nome)
+    cur = conn.execute("INSERT INTO usuarios (nome, nome_canonico) VALUES (?, ?)", (nome, nome))
+    conn.commit()
+    return cur.lastrowid
+
+# Nome de usuário das tabelas antigas (texto livre) como chave do cadastro novo.
+# Linhas sem usuário vão para USUARIO_SEM_NOME em vez de serem descartadas.
+def expressao_usuario_legado(coluna):
+    return f"CASE WHEN TRIM(COALESCE({coluna}, '')) = '' THEN '{USUARIO_SEM_NOME}' ELSE TRIM({coluna}) END"
+
+# ================= MIGRAÇÕES =================
+def _colunas(conn, tabela):
+    return {linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})")}
+
+def _reconstruir(conn, tabela, ddl, colunas_destino, select_origem):
+    conn.execute(ddl.format(tabela=f"{tabela}_nova"))
+    conn.execute(f"INSERT INTO {tabela}_nova ({', '.join(colunas_destino)}) {select_origem}")
+    conn.execute(f"DROP TABLE {tabela}")
+    conn.execute(f"ALTER TABLE {tabela}_nova RENAME TO {tabela}")
+
+# v4: texto livre de usuário/banca/cargo/matéria vira chave inteira para os cadastros.
+# Ids de questões e respostas são preservados (FTS, arquivo e snapshots continuam válidos).
+# Cada tabela é conferida pelas colunas: as que `criar_esquema` acabou de criar
+# (ex.: respostas_resumo num banco anterior à manutenção) já nascem no formato novo.
+def _migrar_para_cadastros(conn):
+    usuarios_legado = "nome_canonico" not in _colunas(conn, "usuarios")
+    questoes_legado = "banca" in _colunas(conn, "questoes")
+    com_usuario = [tabela for tabela in ("respostas", "respostas_resumo", "editais_salvos")
+                   if "usuario" in _colunas(conn, tabela)]
+    if not (usuarios_legado or questoes_legado or com_usuario):
+        return
+    conn.create_function("canonizar", 1, canonizar_nome, deterministic=True)
+    conn.commit()
+    with conn:
+        conn.execute("BEGIN")
+        conn.execute("DROP VIEW IF EXISTS respostas_consolidadas")
+        conn.execute("DROP VIEW IF EXISTS questoes_nomeadas")
+
+        # O cadastro novo nasce como usuarios_nova e só então troca de nome, como em
+        # `_reconstruir`: renomear o antigo faria o SQLite reescrever para ele as
+        # REFERENCES usuarios(id) das tabelas já criadas no formato novo
+        destino = "usuarios_nova" if usuarios_legado else "usuarios"
+        if usuarios_legado:
+            conn.execute(DDL_CADASTRO.format(tabela=destino))
+        origens = (["usuarios"] if usuarios_legado else []) + com_usuario
+        for origem in origens:
+            usuario = expressao_usuario_legado("nome" if origem == "usuarios" else "usuario")
+            conn.execute(f"""
+            INSERT OR IGNORE INTO {destino} (nome, nome_canonico)
+            SELECT {usuario}, {usuario} FROM {origem} ORDER BY rowid
+            """)
+        if usuarios_legado:
+            conn.execute("DROP TABLE usuarios")
+            conn.execute("ALTER TABLE usuarios_nova RENAME TO usuarios")
+
+        if questoes_legado:
+            for tabela, coluna in (("bancas", "banca"), ("cargos", "cargo"), ("materias", "materia")):
+                conn.execute(f"""
+                INSERT OR IGNORE INTO {tabela} (nome, nome_canonico)
+                SELECT TRIM({coluna}), canonizar({coluna}) FROM questoes
+                WHERE TRIM(COALESCE({coluna}, '')) <> '' ORDER BY id
+                """)
+            comuns = ["tema", "enunciado", "alternativas", "gabarito", "explicacao", "tipo", "fonte",
+                      "dificuldade", "tags", "formato_questao", "eh_real", "ano_prova", "hash_questao"]
+            _reconstruir(conn, "questoes", DDL_QUESTOES,
+                ["id", "banca_id", "cargo_id", "materia_id"] + comuns,
+                f"""SELECT q.id, b.id, cg.id, m.id, {', '.join('q.' + col for col in comuns)}
+                FROM questoes q
+                LEFT JOIN bancas b ON b.nome_canonico = canonizar(q.banca)
+                LEFT JOIN cargos cg ON cg.nome_canonico = canonizar(q.cargo)
+                LEFT JOIN materias m ON m.nome_canonico = canonizar(q.materia)""")
+
+        # Todo nome de usuário das origens já está em `usuarios`: o JOIN não descarta linhas
+        if "respostas" in com_usuario:
+            _reconstruir(conn, "respostas", DDL_RESPOSTAS,
+                ["id", "usuario_id", "questao_id", "resposta_usuario", "acertou", "data", "tempo_resposta"],
+                f"""SELECT r.id, u.id, r.questao_id, r.resposta_usuario, r.acertou, r.data, r.tempo_resposta
+                FROM respostas r JOIN usuarios u ON u.nome_canonico = {expressao_usuario_legado('r.usuario')}""")
+        if "respostas_resumo" in com_usuario:
+            # Usuário nulo e vazio viram o mesmo usuário: soma as linhas que passam a colidir na chave
+            _reconstruir(conn, "respostas_resumo", DDL_RESPOSTAS_RESUMO,
+                ["usuario_id", "questao_id", "tentativas", "acertos", "ultima_resposta", "ultimo_acertou", "ultima_data", "tempo_total"],
+                f"""SELECT u.id, s.questao_id, SUM(s.tentativas), SUM(s.acertos), s.ultima_resposta, s.ultimo_acertou,
+                       MAX(s.ultima_data), SUM(s.tempo_total)
+                FROM respostas_resumo s JOIN usuarios u ON u.nome_canonico = {expressao_usuario_legado('s.usuario')}
+                GROUP BY u.id, s.questao_id""")
+        if "editais_salvos" in com_usuario:
+            _reconstruir(conn, "editais_salvos", DDL_EDITAIS,
+                ["id", "usuario_id", "nome_concurso", "banca", "cargo", "dados_json", "data_analise", "nivel_dificuldade", "formato_questoes"],
+                f"""SELECT e.id, u.id, e.nome_concurso, e.banca, e.cargo, e.dados_json, e.data_analise, e.nivel_dificuldade, e.formato_questoes
+                FROM editais_salvos e JOIN usuarios u ON u.nome_canonico = {expressao_usuario_legado('e.usuario')}""")
+
+# PRAGMA user_version guarda até qual versão o arquivo já foi migrado
+def migrar_esquema(conn):
+    versao = conn.execute("PRAGMA user_version").fetchone()[0]
+    codec, treinou_dicionario = preparar_codec(conn)
+
+    if versao < 1 or treinou_dicionario:
+        # v1: alternativas/explicacao/tags passam a ser BLOB comprimido
+        if recomprimir_questoes(conn, codec):
+            conn.execute("VACUUM")
+
+    if versao < 2 and criar_indice_textual(conn):
+        # v2: indexa no FTS as questões gravadas antes da criação dos triggers
+        conn.execute("INSERT INTO questoes_fts (questoes_fts) VALUES ('rebuild')")
+        conn.commit()
+
+    if versao < 3:
+        # v3: auto_vacuum incremental (só vale para um arquivo existente depois de um VACUUM)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+    if versao < 4:
+        _migrar_para_cadastros(conn)
+
+    if versao < VERSAO_ESQUEMA:
+        conn.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+        conn.commit()
+
+def abrir_conexao(caminho=NOME_BANCO):
+    conn = sqlite3.connect(caminho, check_same_thread=False)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("PRAGMA journal_mode = WAL")
+    criar_esquema(conn)
+    migrar_esquema(conn)
+    criar_indices(conn)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+# ================= IDENTIDADE DE QUESTÕES =================
+def gerar_hash_questao(enunciado, gabarito):
+    conteudo = f"{enunciado}_{gabarito}".lower().strip()
+    return hashlib.md5(conteudo.encode('utf-8')).hexdigest()
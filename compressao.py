@@ -0,0 +1,197 @@
+import re
+import struct
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ================= CODEC DE ARMAZENAMENTO =================
+# Os campos grandes de `questoes` (alternativas, explicacao, tags) são gravados
+# como BLOB comprimido com um dicionário treinado nas próprias questões.
+# Valores antigos em TEXT continuam legíveis: só BLOBs com o marcador são descomprimidos.
+
+CAMPOS_COMPRIMIDOS = ("alternativas", "explicacao", "tags")
+MARCADOR = b"\xc7Q"
+CABECALHO = struct.Struct(">2sBH")  # marcador, algoritmo, id do dicionário
+ALGO_ZLIB = 1
+ALGO_ZSTD = 2
+TAMANHO_MINIMO = 64
+# Cada campo é comprimido uma vez e lido muitas: nível moderado, sem o custo dos níveis máximos
+NIVEL_ZLIB = 6
+NIVEL_ZSTD = 9
+TAMANHO_DICIONARIO_ZLIB = 32 * 1024  # janela máxima do zlib
+TAMANHO_DICIONARIO_ZSTD = 64 * 1024
+AMOSTRAS_TREINO = 500
+AMOSTRAS_MINIMAS = 50
+TAMANHO_LOTE = 1000
+
+# `recarregar` devolve os dicionários gravados no banco. Outro processo (importação,
+# réplica) pode treinar um dicionário novo e recomprimir as questões: um id
+# desconhecido faz o codec reler a tabela em vez de falhar até o app reiniciar.
+class CodecArmazenamento:
+    def __init__(self, dicionarios=None, id_ativo=0, recarregar=None):
+        self.dicionarios = dicionarios or {}  # id -> (algoritmo, bytes)
+        self.id_ativo = id_ativo
+        self.recarregar = recarregar
+        self._dicts_zstd = {}
+        self._compressores_zlib = {}  # id -> compressobj já com o zdict; cada campo usa uma cópia
+        self._compressores_zstd = {}
+        self._trava = threading.RLock()
+
+    def _dicionario(self, id_dicionario):
+        if id_dicionario not in self.dicionarios and self.recarregar is not None:
+            with self._trava:
+                if id_dicionario not in self.dicionarios:
+                    self.dicionarios = self.recarregar()
+                    self.id_ativo = max(self.dicionarios, default=0)
+        return self.dicionarios[id_dicionario]
+
+    def _dict_zstd(self, id_dicionario):
+        if id_dicionario not in self._dicts_zstd:
+            self._dicts_zstd[id_dicionario] = zstandard.ZstdCompressionDict(self._dicionario(id_dicionario)[1])
+        return self._dicts_zstd[id_dicionario]
+
+    def _compressor_zlib(self, id_dicionario, dicionario):
+        if id_dicionario not in self._compressores_zlib:
+            self._compressores_zlib[id_dicionario] = zlib.compressobj(NIVEL_ZLIB, zdict=dicionario) if dicionario else zlib.compressobj(NIVEL_ZLIB)
+        return self._compressores_zlib[id_dicionario].copy()
+
+    def comprimir(self, texto):
+        if not isinstance(texto, str) or len(texto) < TAMANHO_MINIMO:
+            return texto
+        bruto = texto.encode("utf-8")
+        id_ativo = self.id_ativo
+        algoritmo, dicionario = self.dicionarios.get(id_ativo, (ALGO_ZLIB, b""))
+
+        if algoritmo == ALGO_ZSTD:
+            # ZstdCompressor não pode ser usado por duas threads ao mesmo tempo
+            with self._trava:
+                if id_ativo not in self._compressores_zstd:
+                    self._compressores_zstd[id_ativo] = zstandard.ZstdCompressor(level=NIVEL_ZSTD, dict_data=self._dict_zstd(id_ativo))
+                dados = self._compressores_zstd[id_ativo].compress(bruto)
+        else:
+            compressor = self._compressor_zlib(id_ativo, dicionario)
+            dados = compressor.compress(bruto) + compressor.flush()
+
+        if len(dados) + CABECALHO.size >= len(bruto):
+            return texto
+        return CABECALHO.pack(MARCADOR, algoritmo, id_ativo) + dados
+
+    def descomprimir(self, valor):
+        if not isinstance(valor, bytes):
+            return valor
+        if valor[:len(MARCADOR)] != MARCADOR:
+            return valor.decode("utf-8")
+
+        _, algoritmo, id_dicionario = CABECALHO.unpack_from(valor)
+        dados = valor[CABECALHO.size:]
+        if algoritmo == ALGO_ZSTD:
+            bruto = zstandard.ZstdDecompressor(dict_data=self._dict_zstd(id_dicionario)).decompress(dados)
+        else:
+            dicionario = self._dicionario(id_dicionario)[1] if id_dicionario else b""
+            descompressor = zlib.decompressobj(zdict=dicionario) if dicionario else zlib.decompressobj()
+            bruto = descompressor.decompress(dados) + descompressor.flush()
+        return bruto.decode("utf-8")
+
+# ================= DICIONÁRIOS =================
+def criar_tabela_dicionarios(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS dicionarios_compressao (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        algoritmo INTEGER, dados BLOB, criado_em TEXT
+    )
+    """)
+
+def ler_dicionarios(conn):
+    linhas = conn.execute("SELECT id, algoritmo, dados FROM dicionarios_compressao ORDER BY id").fetchall()
+    return {id_dic: (algoritmo, bytes(dados)) for id_dic, algoritmo, dados in linhas}
+
+def carregar_codec(conn):
+    dicionarios = ler_dicionarios(conn)
+    return CodecArmazenamento(dicionarios, max(dicionarios, default=0), recarregar=lambda: ler_dicionarios(conn))
+
+def _treinar_zlib(amostras):
+    # O zlib não treina dicionários: usamos os trechos mais repetidos das amostras,
+    # com os mais frequentes no final (mais perto dos dados, referências mais curtas).
+    contagem = Counter()
+    for texto in amostras:
+        palavras = re.findall(r"\S+\s*", texto)
+        for n in (2, 3, 4):
+            for i in range(len(palavras) - n + 1):
+                contagem["".join(palavras[i:i + n])] += 1
+
+    trechos = []
+    tamanho = 0
+    for trecho, frequencia in contagem.most_common():
+        if frequencia < 3:
+            break
+        bruto = trecho.encode("utf-8")
+        if tamanho + len(bruto) > TAMANHO_DICIONARIO_ZLIB:
+            continue
+        trechos.append(bruto)
+        tamanho += len(bruto)
+    return b"".join(reversed(trechos))
+
+def treinar_dicionario(amostras):
+    if zstandard is not None:
+        try:
+            dicionario = zstandard.train_dictionary(TAMANHO_DICIONARIO_ZSTD, [a.encode("utf-8") for a in amostras])
+            return ALGO_ZSTD, dicionario.as_bytes()
+        except zstandard.ZstdError:
+            pass
+    return ALGO_ZLIB, _treinar_zlib(amostras)
+
+def preparar_codec(conn):
+    codec = carregar_codec(conn)
+    if codec.id_ativo:
+        return codec, False
+
+    linhas = conn.execute(
+        f"SELECT {', '.join(CAMPOS_COMPRIMIDOS)} FROM questoes ORDER BY RANDOM() LIMIT ?",
+        (AMOSTRAS_TREINO,)
+    ).fetchall()
+    amostras = [codec.descomprimir(valor) for linha in linhas for valor in linha if valor]
+    amostras = [texto for texto in amostras if len(texto) >= TAMANHO_MINIMO]
+    if len(amostras) < AMOSTRAS_MINIMAS:
+        return codec, False
+
+    algoritmo, dados = treinar_dicionario(amostras)
+    conn.execute(
+        "INSERT INTO dicionarios_compressao (algoritmo, dados, criado_em) VALUES (?, ?, ?)",
+        (algoritmo, dados, str(datetime.now()))
+    )
+    conn.commit()
+    return carregar_codec(conn), True
+
+def recomprimir_questoes(conn, codec, tamanho_lote=TAMANHO_LOTE):
+    leitura = conn.cursor()
+    escrita = conn.cursor()
+    ultimo_id = 0
+    alteradas = 0
+    while True:
+        leitura.execute(
+            f"SELECT id, {', '.join(CAMPOS_COMPRIMIDOS)} FROM questoes WHERE id > ? ORDER BY id LIMIT ?",
+            (ultimo_id, tamanho_lote)
+        )
+        linhas = leitura.fetchall()
+        if not linhas:
+            break
+        ultimo_id = linhas[-1][0]
+
+        atualizacoes = []
+        for q_id, *valores in linhas:
+            novos = [codec.comprimir(codec.descomprimir(valor)) for valor in valores]
+            if novos != valores:
+                atualizacoes.append((*novos, q_id))
+        escrita.executemany(
+            f"UPDATE questoes SET {', '.join(f'{campo} = ?' for campo in CAMPOS_COMPRIMIDOS)} WHERE id = ?",
+            atualizacoes
+        )
+        conn.commit()
+        alteradas += len(atualizacoes)
+    return alteradas
@@ -0,0 +1,177 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from provedores_ia import TIMEOUT_CHAMADA_PADRAO, ProvedorIA
+
+# ================= INFERÊNCIA LOCAL (OPENAI-COMPATÍVEL) =================
+# Servidor próprio (llama.cpp `llama-server`, vLLM, ...) exposto numa base_url
+# compatível com a API da OpenAI. As requisições das várias sessões entram numa
+# fila; uma thread junta as que chegarem dentro de `janela` segundos (até
+# `tamanho_lote`) e as dispara juntas, para o batching contínuo do servidor
+# processá-las no mesmo passo. `tamanho_lote` deve acompanhar os slots do
+# servidor (`--parallel` no llama.cpp, `--max-num-seqs` no vLLM).
+
+TAMANHO_LOTE_PADRAO = 8
+JANELA_LOTE_PADRAO = 0.02
+MODELO_LOCAL_PADRAO = "local"
+
+class LoteadorRequisicoes:
+    def __init__(self, funcao, tamanho_lote=TAMANHO_LOTE_PADRAO, janela=JANELA_LOTE_PADRAO):
+        self.funcao = funcao
+        self.tamanho_lote = tamanho_lote
+        self.janela = janela
+        self.lotes_enviados = 0
+        self.requisicoes_enviadas = 0
+        self._fila = queue.Queue()
+        # Uma vaga por requisição no servidor; volta assim que ela termina
+        self._vagas = threading.Semaphore(tamanho_lote)
+        self._executor = ThreadPoolExecutor(max_workers=tamanho_lote, thread_name_prefix="lote_local")
+        threading.Thread(target=self._despachar, name="loteador_local", daemon=True).start()
+
+    def submeter(self, *args):
+        futuro = Future()
+        self._fila.put((futuro, args))
+        return futuro
+
+    def _coletar(self):
+        lote = [self._fila.get()]
+        limite = time.monotonic() + self.janela
+        while len(lote) < self.tamanho_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _executar(self, futuro, args):
+        try:
+            if not futuro.set_running_or_notify_cancel():
+                return
+            try:
+                futuro.set_result(self.funcao(*args))
+            except Exception as e:
+                futuro.set_exception(e)
+        finally:
+            self._vagas.release()
+
+    def _despachar(self):
+        while True:
+            lote = self._coletar()
+            self.lotes_enviados += 1
+            self.requisicoes_enviadas += len(lote)
+            # Nunca mais que `tamanho_lote` no servidor, sem esperar o lote anterior inteiro:
+            # uma requisição lenta não segura as que chegarem depois
+            for futuro, args in lote:
+                self._vagas.acquire()
+                self._executor.submit(self._executar, futuro, args)
+
+    @property
+    def tamanho_medio(self):
+        return self.requisicoes_enviadas / self.lotes_enviados if self.lotes_enviados else 0.0
+
+# Mesmo contrato do ProvedorIA (devolve a resposta do cliente OpenAI sem mudanças);
+# só o envio passa pelo loteador, e a espera na fila entra na latência medida
+class ProvedorLocal(ProvedorIA):
+    def __init__(self, nome, cliente, modelo, max_tokens=None, tamanho_lote=TAMANHO_LOTE_PADRAO, janela=JANELA_LOTE_PADRAO,
+                 timeout=TIMEOUT_CHAMADA_PADRAO):
+        super().__init__(nome, cliente, modelo, max_tokens, timeout)
+        self.loteador = LoteadorRequisicoes(super().enviar, tamanho_lote, janela)
+
+    def enviar(self, parametros):
+        return self.loteador.submeter(parametros).result()
+
+# ================= SERVIDOR STUB (TESTES) =================
+# Responde /v1/chat/completions no formato da OpenAI com um JSON fixo, depois de
+# `atraso` segundos. Mensagens de sistema já vistas contam como cache de prefixo
+# em `usage.prompt_tokens_details`. Serve para testar o provedor local sem modelo carregado:
+#   python inferencia_local.py stub --porta 8089
+#   LOCAL_LLM_BASE_URL = "http://127.0.0.1:8089/v1"  (em .streamlit/secrets.toml)
+
+RESPOSTA_STUB = {"questoes": [{
+    "enunciado": "Questão de teste gerada pelo servidor stub.",
+    "alternativas": {"A": "Certo", "B": "Errado"},
+    "gabarito": "A",
+    "explicacao": "Resposta fixa do servidor stub.",
+    "comentarios": {},
+}]}
+
+def criar_servidor_stub(porta=8089, atraso=0.5, conteudo=RESPOSTA_STUB):
+    prefixos_vistos = set()
+
+    class Manipulador(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            pedido = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(atraso)
+            texto = json.dumps(conteudo, ensure_ascii=False)
+            mensagens = pedido.get("messages", [])
+            prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in mensagens)
+            sistema = str(mensagens[0].get("content", "")) if mensagens and mensagens[0].get("role") == "system" else ""
+            cached_tokens = len(sistema.split()) if sistema in prefixos_vistos else 0
+            prefixos_vistos.add(sistema)
+            corpo = json.dumps({
+                "id": f"stub-{time.time_ns()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": pedido.get("model", MODELO_LOCAL_PADRAO),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": texto}}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens, "completion_tokens": len(texto.split()),
+                    "total_tokens": prompt_tokens + len(texto.split()),
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                },
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    return ThreadingHTTPServer(("127.0.0.1", porta), Manipulador)
+
+# ================= LINHA DE COMANDO =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Utilitários do provedor de inferência local.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    stub = subcomandos.add_parser("stub", help="Sobe um servidor OpenAI-compatível de teste")
+    stub.add_argument("--porta", type=int, default=8089)
+    stub.add_argument("--atraso", type=float, default=0.5, help="Segundos por resposta (padrão: %(default)s)")
+    carga = subcomandos.add_parser("carga", help="Dispara requisições simultâneas contra uma base_url")
+    carga.add_argument("base_url")
+    carga.add_argument("--modelo", default=MODELO_LOCAL_PADRAO)
+    carga.add_argument("--requisicoes", type=int, default=32)
+    carga.add_argument("--lote", type=int, default=TAMANHO_LOTE_PADRAO)
+    carga.add_argument("--janela", type=float, default=JANELA_LOTE_PADRAO)
+    args = parser.parse_args()
+
+    if args.comando == "stub":
+        servidor = criar_servidor_stub(args.porta, args.atraso)
+        print(f"Servidor stub em http://127.0.0.1:{args.porta}/v1")
+        servidor.serve_forever()
+    else:
+        from openai import OpenAI
+
+        provedor = ProvedorLocal("Local", OpenAI(api_key="sk-local", base_url=args.base_url), args.modelo,
+                                 tamanho_lote=args.lote, janela=args.janela)
+        inicio = time.monotonic()
+        with ThreadPoolExecutor(max_workers=args.requisicoes) as executor:
+            respostas = list(executor.map(
+                lambda i: provedor.chamar([{"role": "user", "content": f"Requisição {i}"}], 0.7),
+                range(args.requisicoes)
+            ))
+        duracao = time.monotonic() - inicio
+        print(f"{len(respostas)} respostas em {duracao:.2f}s | {provedor.loteador.lotes_enviados} lotes "
+              f"(média {provedor.loteador.tamanho_medio:.1f} requisições por lote)")
@@ -0,0 +1,115 @@
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from banco import expressao_usuario_legado
+
+# ================= MANUTENÇÃO DA TABELA DE RESPOSTAS =================
+# `respostas` guarda só o período recente. Respostas mais antigas que o horizonte
+# de retenção são somadas em `respostas_resumo` (uma linha por usuário/questão),
+# copiadas para um banco de arquivo separado e apagadas da tabela quente.
+# A view `respostas_consolidadas` junta as duas para estatísticas e revisão.
+
+RETENCAO_DIAS_PADRAO = 90
+INTERVALO_HORAS_PADRAO = 6
+ARQUIVO_PADRAO = "estudos_arquivo.db"
+PAGINAS_VACUUM_POR_RODADA = 2000
+
+log = logging.getLogger("manutencao")
+
+COLUNAS_ARQUIVO = "id, usuario_id, questao_id, resposta_usuario, acertou, data, tempo_resposta"
+
+def _anexar_arquivo(conn, caminho_arquivo):
+    conn.execute("ATTACH DATABASE ? AS arquivo", (caminho_arquivo,))
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS arquivo.respostas (
+        id INTEGER PRIMARY KEY,
+        usuario_id INTEGER, questao_id INTEGER, resposta_usuario TEXT,
+        acertou INTEGER, data TEXT, tempo_resposta INTEGER DEFAULT 0
+    )
+    """)
+    colunas = {linha[1] for linha in conn.execute("PRAGMA arquivo.table_info(respostas)")}
+    if "usuario_id" not in colunas:
+        # Arquivo gravado antes dos cadastros com chave inteira: resolve o id pelo nome
+        with conn:
+            conn.execute("ALTER TABLE arquivo.respostas ADD COLUMN usuario_id INTEGER")
+            conn.execute(f"""
+            UPDATE arquivo.respostas SET usuario_id = (
+                SELECT id FROM main.usuarios WHERE nome_canonico = {expressao_usuario_legado('arquivo.respostas.usuario')}
+            )
+            """)
+
+def consolidar_respostas(conn, caminho_arquivo=ARQUIVO_PADRAO, retencao_dias=RETENCAO_DIAS_PADRAO):
+    limite = str(datetime.now() - timedelta(days=retencao_dias))
+    _anexar_arquivo(conn, caminho_arquivo)
+    try:
+        with conn:
+            # Com um único MAX(data), o SQLite devolve resposta/acerto da linha mais recente do grupo
+            conn.execute("""
+            INSERT INTO respostas_resumo (usuario_id, questao_id, tentativas, acertos, ultima_resposta, ultimo_acertou, ultima_data, tempo_total)
+            SELECT usuario_id, questao_id, COUNT(*), SUM(acertou), resposta_usuario, acertou, MAX(data), SUM(tempo_resposta)
+            FROM main.respostas
+            WHERE data < ?
+            GROUP BY usuario_id, questao_id
+            ON CONFLICT (usuario_id, questao_id) DO UPDATE SET
+                tentativas = tentativas + excluded.tentativas,
+                acertos = acertos + excluded.acertos,
+                tempo_total = tempo_total + excluded.tempo_total,
+                ultima_resposta = CASE WHEN excluded.ultima_data >= ultima_data THEN excluded.ultima_resposta ELSE ultima_resposta END,
+                ultimo_acertou = CASE WHEN excluded.ultima_data >= ultima_data THEN excluded.ultimo_acertou ELSE ultimo_acertou END,
+                ultima_data = MAX(ultima_data, excluded.ultima_data)
+            """, (limite,))
+            conn.execute(f"""
+            INSERT OR IGNORE INTO arquivo.respostas ({COLUNAS_ARQUIVO})
+            SELECT {COLUNAS_ARQUIVO} FROM main.respostas WHERE data < ?
+            """, (limite,))
+            consolidadas = conn.execute("DELETE FROM main.respostas WHERE data < ?", (limite,)).rowcount
+    finally:
+        conn.execute("DETACH DATABASE arquivo")
+    return consolidadas
+
+# Conexão própria, como a da manutenção: o ATTACH não pode aparecer para outras
+# sessões que compartilham a conexão do app
+def apagar_historico_usuario(caminho_banco, usuario_id, caminho_arquivo=ARQUIVO_PADRAO):
+    conn = sqlite3.connect(caminho_banco, timeout=30)
+    try:
+        _anexar_arquivo(conn, caminho_arquivo)
+        with conn:
+            conn.execute("DELETE FROM main.respostas WHERE usuario_id = ?", (usuario_id,))
+            conn.execute("DELETE FROM main.respostas_resumo WHERE usuario_id = ?", (usuario_id,))
+            conn.execute("DELETE FROM arquivo.respostas WHERE usuario_id = ?", (usuario_id,))
+    finally:
+        conn.close()
+
+def executar_manutencao(caminho_banco, caminho_arquivo=ARQUIVO_PADRAO, retencao_dias=RETENCAO_DIAS_PADRAO):
+    conn = sqlite3.connect(caminho_banco, timeout=30)
+    try:
+        consolidadas = consolidar_respostas(conn, caminho_arquivo, retencao_dias)
+        conn.execute("ANALYZE")
+        # Pelo execute() o sqlite3 dá um só passo no PRAGMA e libera uma página; executescript roda até o fim
+        conn.executescript(f"PRAGMA incremental_vacuum({PAGINAS_VACUUM_POR_RODADA})")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        log.info("Manutenção concluída: %d respostas consolidadas", consolidadas)
+        return consolidadas
+    finally:
+        conn.close()
+
+class AgendadorManutencao(threading.Thread):
+    def __init__(self, caminho_banco, caminho_arquivo=ARQUIVO_PADRAO, retencao_dias=RETENCAO_DIAS_PADRAO, intervalo_horas=INTERVALO_HORAS_PADRAO):
+        super().__init__(name="manutencao", daemon=True)
+        self.caminho_banco = caminho_banco
+        self.caminho_arquivo = caminho_arquivo
+        self.retencao_dias = retencao_dias
+        self.intervalo = intervalo_horas * 3600
+        self.ultima_execucao = None
+
+    def run(self):
+        while True:
+            try:
+                executar_manutencao(self.caminho_banco, self.caminho_arquivo, self.retencao_dias)
+                self.ultima_execucao = datetime.now()
+            except Exception:
+                log.exception("Falha na manutenção do banco")
+            time.sleep(self.intervalo)
@@ -0,0 +1,180 @@
+import functools
+
+# ================= MODELOS DE PROMPT =================
+# O cache automático de prefixo dos provedores (DeepSeek, OpenAI, vLLM/llama.cpp)
+# só reaproveita o começo idêntico do prompt. Cada pedido vira duas mensagens:
+# um prefixo de sistema fixo por (tipo, formato da banca), com instruções,
+# diretriz de explicação e modelo de JSON, e um sufixo de usuário com tudo o que
+# varia, do mais estável (banca, cargo) ao mais volátil (contexto, quantidade).
+# Nada que dependa do pedido pode entrar no prefixo.
+#
+# A resposta vem num esquema compacto e posicional, só com o que o modelo precisa
+# produzir; fonte, dificuldade, tags, formato e eh_real são preenchidos aqui por
+# `decodificar_questoes`, que devolve o mesmo dicionário de antes por questão.
+
+TIPO_INEDITAS = "ineditas"
+TIPO_REAIS = "reais"
+
+FORMATO_CERTO_ERRADO = "Certo/Errado"
+FORMATO_A_D = "A a D"
+FORMATO_A_E = "A a E"
+
+LETRAS = "ABCDE"
+QUANTIDADE_ALTERNATIVAS = {FORMATO_A_D: 4, FORMATO_A_E: 5}
+GABARITO_CERTO_ERRADO = {"C": "Certo", "E": "Errado"}
+
+def classificar_formato(formato_principal):
+    if "Certo/Errado" in formato_principal:
+        return FORMATO_CERTO_ERRADO
+    if "A a D" in formato_principal:
+        return FORMATO_A_D
+    return FORMATO_A_E
+
+_INSTRUCAO_FORMATO = {
+    FORMATO_CERTO_ERRADO: """FORMATO OBRIGATÓRIO: Certo/Errado
+- Cada questão deve ter uma assertiva clara
+- Gabarito: use EXATAMENTE "C" (Certo) ou "E" (Errado)
+- Sem alternativas A, B, C, D, E""",
+    FORMATO_A_D: """FORMATO OBRIGATÓRIO: Múltipla Escolha com 4 alternativas DIFERENTES (A, B, C, D)
+- Gabarito: use EXATAMENTE uma letra isolada: "A", "B", "C" ou "D\"""",
+    FORMATO_A_E: """FORMATO OBRIGATÓRIO: Múltipla Escolha com 5 alternativas TODAS DIFERENTES (A, B, C, D, E)
+- Gabarito: use EXATAMENTE uma letra isolada: "A", "B", "C", "D" ou "E\"""",
+}
+
+_CABECALHO = {
+    TIPO_INEDITAS: """🎨 PROTOCOLO DE CRIAÇÃO DE QUESTÕES INÉDITAS
+⭐ CRIAÇÃO DE QUESTÕES INÉDITAS E ÚNICAS ⭐
+Você CRIARÁ questões NOVAS, ORIGINAIS e NUNCA VISTAS. Não copie questões existentes.
+Siga o padrão da banca, o nível, a jurisprudência e os exemplos de estilo informados no pedido.""",
+    TIPO_REAIS: """📋 PROTOCOLO DE TRANSCRIÇÃO DE QUESTÕES REAIS DE PROVAS
+Você TRANSCREVERÁ questões REAIS de provas anteriores da banca informada no pedido.
+Transcreva EXATAMENTE a quantidade pedida, usando o contexto das provas reais informado.""",
+}
+
+_DIRETRIZ_EXPLICACAO = {
+    TIPO_INEDITAS: """DIRETRIZ CRÍTICA DE EXPLICAÇÃO (ANATOMIA DIDÁTICA DO ERRO):
+É estritamente proibido fornecer explicações rasas (ex: "Correta, pois garante segurança jurídica").
+Para CADA alternativa nos comentários (na explicação, em Certo/Errado), você DEVE atuar como um professor de Direito:
+1. Defina rapidamente o instituto jurídico envolvido.
+2. Cite a norma brasileira (artigo/lei) ou Súmula/Tema do STF/STJ que fundamenta o acerto ou o erro.
+3. Explique de forma prática POR QUE a alternativa falhou ou acertou.""",
+    TIPO_REAIS: """DIRETRIZ CRÍTICA DE EXPLICAÇÃO (ANATOMIA DIDÁTICA DO ERRO):
+É estritamente proibido fornecer explicações rasas (ex: "A alternativa B é o gabarito oficial").
+Para CADA alternativa nos comentários (na explicação, em Certo/Errado), ensine o assunto:
+1. Defina rapidamente o conceito jurídico daquela alternativa.
+2. Cite a norma brasileira (artigo/lei) ou Súmula do STF/STJ correspondente.
+3. Explique de forma prática o erro ou acerto jurídico.""",
+}
+
+# Campos de cada questão, na ordem em que o modelo os escreve
+def campos_posicionais(tipo, formato):
+    if formato == FORMATO_CERTO_ERRADO:
+        campos = ("enunciado", "gabarito", "explicacao")
+    else:
+        campos = ("enunciado", "alternativas", "gabarito", "explicacao", "comentarios")
+    return campos + (("ano_prova",) if tipo == TIPO_REAIS else ())
+
+_EXEMPLO_CAMPO = {
+    "enunciado": '"enunciado"',
+    "gabarito": '"B"',
+    "explicacao": '"fundamentação geral"',
+    "ano_prova": "2019",
+}
+
+_DESCRICAO_CAMPO = {
+    "enunciado": "enunciado",
+    "explicacao": "fundamentação legal e jurisprudencial ESPECÍFICA geral da questão",
+    "ano_prova": "ano da prova (número)",
+}
+
+def _modelo_resposta(tipo, formato):
+    campos = campos_posicionais(tipo, formato)
+    letras = LETRAS[:QUANTIDADE_ALTERNATIVAS.get(formato, 0)]
+    exemplo = dict(_EXEMPLO_CAMPO)
+    descricao = dict(_DESCRICAO_CAMPO)
+    if formato == FORMATO_CERTO_ERRADO:
+        exemplo["gabarito"] = '"C"'
+        descricao["gabarito"] = 'gabarito: "C" (Certo) ou "E" (Errado)'
+    else:
+        exemplo["alternativas"] = "[" + ", ".join(f'"texto {letra}"' for letra in letras) + "]"
+        exemplo["comentarios"] = "[" + ", ".join(f'"comentário {letra}"' for letra in letras) + "]"
+        descricao["alternativas"] = f"lista com os textos das alternativas {', '.join(letras)}, nessa ordem, sem a letra"
+        descricao["gabarito"] = "letra isolada do gabarito"
+        descricao["comentarios"] = "lista com a explicação didática de cada alternativa, na mesma ordem"
+    item = "[" + ", ".join(exemplo[campo] for campo in campos) + "]"
+    itens = "\n".join(f"{posicao}. {descricao[campo]}" for posicao, campo in enumerate(campos, 1))
+    return f"""RESPOSTA EM JSON COMPACTO (IMPERATIVO):
+{{"q": [{item}]}}
+Cada item de "q" é UMA questão, escrita como lista posicional, sem nomes de campos:
+{itens}
+Não repita fonte, dificuldade, tags ou formato: o sistema já os conhece."""
+
+@functools.lru_cache(maxsize=None)
+def prefixo_sistema(tipo, formato):
+    return "\n\n".join([
+        _CABECALHO[tipo],
+        "ATENÇÃO: BASEIE-SE EXCLUSIVAMENTE NA LEGISLAÇÃO E JURISPRUDÊNCIA BRASILEIRAS VIGENTES.",
+        _INSTRUCAO_FORMATO[formato],
+        _DIRETRIZ_EXPLICACAO[tipo],
+        _modelo_resposta(tipo, formato),
+    ])
+
+# `secoes` vai na ordem recebida: quem chama põe primeiro o que muda menos
+def montar_mensagens(tipo, formato, secoes):
+    sufixo = "\n".join(f"{titulo}: {valor}" for titulo, valor in secoes)
+    return [
+        {"role": "system", "content": prefixo_sistema(tipo, formato)},
+        {"role": "user", "content": sufixo},
+    ]
+
+# ================= DECODIFICAÇÃO DA RESPOSTA =================
+def _por_letra(valor):
+    if isinstance(valor, dict):
+        return valor
+    if isinstance(valor, list):
+        return {letra: texto for letra, texto in zip(LETRAS, valor)}
+    return {}
+
+# Item fora do esquema (outro tamanho, campo faltando ou sobrando) devolve None:
+# com campos posicionais, qualquer desvio desalinharia gabarito e explicação
+def _expandir(item, tipo, formato):
+    campos = campos_posicionais(tipo, formato)
+    if not isinstance(item, list) or len(item) != len(campos):
+        return None
+    questao = dict(zip(campos, item))
+    if formato == FORMATO_CERTO_ERRADO:
+        questao["alternativas"] = {}
+        questao["comentarios"] = {}
+    else:
+        questao["alternativas"] = _por_letra(questao.get("alternativas"))
+        questao["comentarios"] = _por_letra(questao.get("comentarios"))
+    return questao
+
+# Aceita também o formato verboso antigo ({"questoes": [{...}]}), caso o modelo o ignore
+def decodificar_questoes(dados, tipo, campos_fixos):
+    formato = classificar_formato(campos_fixos["formato"])
+    if isinstance(dados, list):
+        itens = dados
+    else:
+        itens = dados.get("q") or dados.get("questoes") or []
+
+    questoes = []
+    for item in itens:
+        if isinstance(item, dict):
+            questao = dict(item)
+        else:
+            questao = _expandir(item, tipo, formato)
+        if questao is None:
+            continue
+        if formato == FORMATO_CERTO_ERRADO:
+            # O prefixo pede "C"/"E" nos dois formatos de resposta; o app compara com "Certo"/"Errado"
+            gabarito = str(questao.get("gabarito", "")).strip().upper()
+            questao["gabarito"] = GABARITO_CERTO_ERRADO.get(gabarito, questao.get("gabarito", ""))
+        questao.update(campos_fixos)
+        if tipo == TIPO_REAIS:
+            try:
+                questao["ano_prova"] = int(questao.get("ano_prova") or 0)
+            except (TypeError, ValueError):
+                questao["ano_prova"] = 0
+        questoes.append(questao)
+    return questoes
@@ -0,0 +1,189 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# ================= PROVEDORES DE IA =================
+# Cada provedor mantém médias móveis exponenciais (EWMA) de latência e de taxa de erro.
+# O roteador tenta primeiro o provedor saudável mais rápido e, se ele não responder
+# dentro de `atraso_hedge` segundos, dispara a mesma requisição no próximo da fila:
+# vale a primeira resposta que chegar. O atraso conta a partir de quando a chamada
+# de fato começa, não de quando entrou na fila do executor. Toda chamada leva um
+# `timeout`: a perdedora que travar devolve sua thread em vez de segurá-la até o fim.
+# Também somam os tokens de entrada servidos do cache de prefixo do provedor
+# (DeepSeek: `prompt_cache_hit_tokens`; OpenAI/Groq/vLLM: `prompt_tokens_details.cached_tokens`).
+
+ALFA_EWMA = 0.3
+ATRASO_HEDGE_PADRAO = 8.0
+LIMITE_TAXA_ERRO = 0.5
+MAX_CHAMADAS_SIMULTANEAS = 16
+TIMEOUT_CHAMADA_PADRAO = 60.0
+INTERVALO_CONSULTA = 0.05
+
+def _campo_uso(objeto, nome):
+    if objeto is None:
+        return None
+    if isinstance(objeto, dict):
+        return objeto.get(nome)
+    return getattr(objeto, nome, None)
+
+def extrair_uso(resposta):
+    uso = getattr(resposta, "usage", None)
+    if uso is None:
+        return None
+    tokens_cache = _campo_uso(uso, "prompt_cache_hit_tokens")
+    if tokens_cache is None:
+        tokens_cache = _campo_uso(_campo_uso(uso, "prompt_tokens_details"), "cached_tokens")
+    return {
+        "tokens_entrada": _campo_uso(uso, "prompt_tokens") or 0,
+        "tokens_cache": tokens_cache or 0,
+        "tokens_saida": _campo_uso(uso, "completion_tokens") or 0,
+    }
+
+class ProvedorIA:
+    def __init__(self, nome, cliente, modelo, max_tokens=None, timeout=TIMEOUT_CHAMADA_PADRAO):
+        self.nome = nome
+        self.cliente = cliente
+        self.modelo = modelo
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.latencia_ewma = None
+        self.taxa_erro_ewma = 0.0
+        self.uso = {
+            "chamadas": 0, "tokens_entrada": 0, "tokens_cache": 0, "tokens_saida": 0,
+            "chamadas_com_cache": 0, "segundos_com_cache": 0.0, "segundos_sem_cache": 0.0,
+        }
+        self._trava = threading.Lock()
+
+    @property
+    def saudavel(self):
+        return self.taxa_erro_ewma < LIMITE_TAXA_ERRO
+
+    def registrar(self, latencia, erro):
+        with self._trava:
+            self.taxa_erro_ewma = ALFA_EWMA * (1.0 if erro else 0.0) + (1 - ALFA_EWMA) * self.taxa_erro_ewma
+            if not erro:
+                if self.latencia_ewma is None:
+                    self.latencia_ewma = latencia
+                else:
+                    self.latencia_ewma = ALFA_EWMA * latencia + (1 - ALFA_EWMA) * self.latencia_ewma
+
+    # Latência separada por chamadas com e sem acerto no cache, para medir o ganho de tempo
+    def registrar_uso(self, resposta, latencia):
+        uso = extrair_uso(resposta)
+        if uso is None:
+            return
+        with self._trava:
+            self.uso["chamadas"] += 1
+            for chave, valor in uso.items():
+                self.uso[chave] += valor
+            if uso["tokens_cache"]:
+                self.uso["chamadas_com_cache"] += 1
+                self.uso["segundos_com_cache"] += latencia
+            else:
+                self.uso["segundos_sem_cache"] += latencia
+
+    @property
+    def taxa_cache(self):
+        return self.uso["tokens_cache"] / self.uso["tokens_entrada"] if self.uso["tokens_entrada"] else None
+
+    def enviar(self, parametros):
+        return self.cliente.chat.completions.create(**parametros)
+
+    def chamar(self, mensagens, temperatura):
+        parametros = {
+            "messages": mensagens,
+            "model": self.modelo,
+            "temperature": temperatura,
+            "response_format": {"type": "json_object"},
+            "timeout": self.timeout,
+        }
+        if self.max_tokens:
+            parametros["max_tokens"] = self.max_tokens
+
+        inicio = time.monotonic()
+        try:
+            resposta = self.enviar(parametros)
+        except Exception:
+            self.registrar(time.monotonic() - inicio, erro=True)
+            raise
+        latencia = time.monotonic() - inicio
+        self.registrar(latencia, erro=False)
+        self.registrar_uso(resposta, latencia)
+        return resposta
+
+# Uma chamada de um provedor dentro de `RoteadorIA.gerar`; marca quando saiu da fila do executor
+class _Tentativa:
+    def __init__(self, provedor):
+        self.provedor = provedor
+        self.iniciada_em = None
+
+    def executar(self, mensagens, temperatura):
+        self.iniciada_em = time.monotonic()
+        return self.provedor.chamar(mensagens, temperatura)
+
+class RoteadorIA:
+    def __init__(self, provedores, atraso_hedge=ATRASO_HEDGE_PADRAO, max_chamadas=MAX_CHAMADAS_SIMULTANEAS):
+        self.provedores = {provedor.nome: provedor for provedor in provedores}
+        self.atraso_hedge = atraso_hedge
+        self._executor = ThreadPoolExecutor(max_workers=max_chamadas, thread_name_prefix="provedor_ia")
+
+    def ordenar(self, preferido=None):
+        # Provedor sem histórico entra com a latência do próprio atraso de hedge
+        def chave(provedor):
+            latencia = provedor.latencia_ewma if provedor.latencia_ewma is not None else self.atraso_hedge
+            return (provedor.nome != preferido, not provedor.saudavel, latencia)
+        return sorted(self.provedores.values(), key=chave)
+
+    def gerar(self, mensagens, temperatura, preferido=None):
+        fila = self.ordenar(preferido)
+        em_voo = {}
+        ultimo_erro = None
+
+        def disparar():
+            tentativa = _Tentativa(fila.pop(0))
+            em_voo[self._executor.submit(tentativa.executar, mensagens, temperatura)] = tentativa
+            return tentativa
+
+        ultima = disparar()
+        while em_voo:
+            # Com o executor cheio a última tentativa ainda espera uma thread: o hedge
+            # só começa a contar quando ela sai da fila, então consulta de tempos em tempos
+            prazo_hedge = None
+            if fila:
+                espera = INTERVALO_CONSULTA
+                if ultima.iniciada_em is not None:
+                    prazo_hedge = ultima.iniciada_em + self.atraso_hedge
+                    espera = max(0.0, prazo_hedge - time.monotonic())
+            prontos, _ = wait(em_voo, timeout=espera if fila else None, return_when=FIRST_COMPLETED)
+            if not prontos:
+                if prazo_hedge is not None and time.monotonic() >= prazo_hedge:
+                    ultima = disparar()
+                continue
+
+            for futuro in prontos:
+                provedor = em_voo.pop(futuro).provedor
+                try:
+                    resposta = futuro.result()
+                except Exception as e:
+                    ultimo_erro = e
+                    if fila and not em_voo:
+                        ultima = disparar()
+                    continue
+
+                # A chamada perdedora não é interrompida no meio do HTTP: a que ainda
+                # não começou é cancelada; a que já começou termina ou estoura o timeout
+                # (e ainda alimenta as estatísticas do seu provedor).
+                for perdedor in em_voo:
+                    perdedor.cancel()
+                return resposta, provedor.nome
+
+        raise ultimo_erro
+
+    def resumo(self):
+        return {
+            nome: {
+                "latencia": provedor.latencia_ewma, "taxa_erro": provedor.taxa_erro_ewma, "saudavel": provedor.saudavel,
+                "taxa_cache": provedor.taxa_cache, **provedor.uso,
+            }
+            for nome, provedor in self.provedores.items()
+        }
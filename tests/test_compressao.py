@@ -0,0 +1,41 @@
+import json
+
+from banco import abrir_conexao
+from compressao import AMOSTRAS_MINIMAS, carregar_codec
+
+def explicacao(i):
+    return json.dumps({"geral": f"Questão {i}: conforme o art. {i} da Lei 8.112/90 e a Súmula 473 do STF, "
+                                "a Administração pode anular seus próprios atos quando eivados de vícios."})
+
+def test_codec_recarrega_dicionario_treinado_por_outro_processo(tmp_path):
+    caminho = str(tmp_path / "estudos.db")
+    conn = abrir_conexao(caminho)
+    codec = carregar_codec(conn)
+    assert codec.id_ativo == 0
+    with conn:
+        conn.executemany("INSERT INTO questoes (enunciado, explicacao) VALUES (?, ?)",
+                         [(f"Enunciado {i}", codec.comprimir(explicacao(i))) for i in range(AMOSTRAS_MINIMAS * 2)])
+
+    # Outra conexão (ex.: transferencia_banco.py) treina o dicionário 1 e recomprime o banco
+    outra = abrir_conexao(caminho)
+    outra.close()
+
+    gravadas = conn.execute("SELECT id, explicacao FROM questoes ORDER BY id").fetchall()
+    assert all(isinstance(valor, bytes) for _, valor in gravadas)
+    assert [codec.descomprimir(valor) for _, valor in gravadas] == [explicacao(i) for i in range(len(gravadas))]
+    assert codec.id_ativo == 1
+
+    # Depois de recarregar, as gravações novas já usam o dicionário treinado
+    comprimida = codec.comprimir(explicacao(999))
+    assert comprimida[3:5] == (1).to_bytes(2, "big")
+    assert codec.descomprimir(comprimida) == explicacao(999)
+    conn.close()
+
+def test_compressor_reaproveitado_gera_o_mesmo_resultado(tmp_path):
+    conn = abrir_conexao(str(tmp_path / "estudos.db"))
+    codec = carregar_codec(conn)
+    textos = [explicacao(i) for i in range(20)]
+    primeira = [codec.comprimir(texto) for texto in textos]
+    assert [codec.comprimir(texto) for texto in textos] == primeira
+    assert [codec.descomprimir(valor) for valor in primeira] == textos
+    conn.close()
@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from inferencia_local import LoteadorRequisicoes, ProvedorLocal, criar_servidor_stub
+
+# Cliente mínimo no formato do SDK da OpenAI (chat.completions.create), via urllib
+class ClienteHTTP:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.criar))
+        self.simultaneas = 0
+        self.pico_simultaneas = 0
+        self._trava = threading.Lock()
+
+    def criar(self, **parametros):
+        with self._trava:
+            self.simultaneas += 1
+            self.pico_simultaneas = max(self.pico_simultaneas, self.simultaneas)
+        try:
+            pedido = urllib.request.Request(
+                f"{self.base_url}/chat/completions", data=json.dumps(parametros).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(pedido, timeout=10) as resposta:
+                return json.loads(resposta.read(), object_hook=lambda campos: SimpleNamespace(**campos))
+        finally:
+            with self._trava:
+                self.simultaneas -= 1
+
+@pytest.fixture
+def servidor_stub():
+    servidor = criar_servidor_stub(porta=0, atraso=0.3)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}/v1"
+    servidor.shutdown()
+    servidor.server_close()
+
+def test_provedor_local_agrupa_chamadas_simultaneas(servidor_stub):
+    cliente = ClienteHTTP(servidor_stub)
+    provedor = ProvedorLocal("Local", cliente, "local", tamanho_lote=4, janela=0.2)
+
+    # A requisição i tem i + 1 palavras: o stub devolve isso em usage.prompt_tokens
+    def chamar(i):
+        return provedor.chamar([{"role": "user", "content": " ".join(["palavra"] * (i + 1))}], 0.0)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        respostas = list(executor.map(chamar, range(8)))
+
+    assert [resposta.usage.prompt_tokens for resposta in respostas] == list(range(1, 9))
+    assert all(json.loads(resposta.choices[0].message.content)["questoes"] for resposta in respostas)
+    assert provedor.loteador.requisicoes_enviadas == 8
+    assert provedor.loteador.lotes_enviados == 2
+    assert cliente.pico_simultaneas <= 4
+    assert provedor.uso["chamadas"] == 8
+
+def test_requisicao_lenta_nao_segura_o_proximo_lote():
+    def dormir(segundos):
+        time.sleep(segundos)
+        return segundos
+
+    loteador = LoteadorRequisicoes(dormir, tamanho_lote=2, janela=0.05)
+    lenta = loteador.submeter(1.0)
+    rapida = loteador.submeter(0.05)
+    assert rapida.result(timeout=2) == 0.05
+
+    # A vaga da rápida já voltou: a próxima sai sem esperar a lenta terminar
+    inicio = time.monotonic()
+    assert loteador.submeter(0.05).result(timeout=2) == 0.05
+    assert time.monotonic() - inicio < 0.5
+    assert not lenta.done()
+    assert lenta.result(timeout=2) == 1.0
@@ -0,0 +1,54 @@
+import sqlite3
+from datetime import datetime
+
+from banco import abrir_conexao, cadastrar_usuario
+from manutencao import PAGINAS_VACUUM_POR_RODADA, consolidar_respostas, executar_manutencao
+
+def responder(conn, usuario_id, questao_id, resposta, acertou, data, tempo):
+    with conn:
+        conn.execute(
+            "INSERT INTO respostas (usuario_id, questao_id, resposta_usuario, acertou, data, tempo_resposta) VALUES (?, ?, ?, ?, ?, ?)",
+            (usuario_id, questao_id, resposta, acertou, data, tempo))
+
+def test_consolidar_duas_vezes_acumula_no_mesmo_resumo(tmp_path):
+    conn = abrir_conexao(str(tmp_path / "estudos.db"))
+    arquivo = str(tmp_path / "arquivo.db")
+    usuario_id = cadastrar_usuario(conn, "Ana")
+    with conn:
+        questao_id = conn.execute("INSERT INTO questoes (enunciado) VALUES ('Enunciado')").lastrowid
+
+    responder(conn, usuario_id, questao_id, "A", 0, "2020-01-01 10:00:00", 10)
+    responder(conn, usuario_id, questao_id, "B", 1, "2020-01-02 10:00:00", 20)
+    assert consolidar_respostas(conn, arquivo) == 2
+    resumo = "SELECT tentativas, acertos, ultima_resposta, ultimo_acertou, ultima_data, tempo_total FROM respostas_resumo"
+    assert conn.execute(resumo).fetchall() == [(2, 1, "B", 1, "2020-01-02 10:00:00", 30)]
+
+    # Segunda rodada: soma na linha existente; a resposta recente fica na tabela quente
+    responder(conn, usuario_id, questao_id, "C", 0, "2020-01-03 10:00:00", 5)
+    responder(conn, usuario_id, questao_id, "D", 1, "2019-12-31 10:00:00", 1)
+    responder(conn, usuario_id, questao_id, "B", 1, str(datetime.now()), 7)
+    assert consolidar_respostas(conn, arquivo) == 2
+    assert conn.execute(resumo).fetchall() == [(4, 2, "C", 0, "2020-01-03 10:00:00", 36)]
+    assert conn.execute("SELECT resposta_usuario FROM respostas").fetchall() == [("B",)]
+    assert conn.execute("SELECT SUM(tentativas), SUM(acertos) FROM respostas_consolidadas").fetchone() == (5, 3)
+
+    arquivadas = sqlite3.connect(arquivo)
+    assert arquivadas.execute("SELECT resposta_usuario FROM respostas ORDER BY data").fetchall() == [("D",), ("A",), ("B",), ("C",)]
+    arquivadas.close()
+    conn.close()
+
+def test_manutencao_libera_paginas_com_vacuum_incremental(tmp_path):
+    caminho = str(tmp_path / "estudos.db")
+    conn = abrir_conexao(caminho)
+    with conn:
+        conn.executemany("INSERT INTO questoes (enunciado) VALUES (?)", [("x" * 4000,) for _ in range(3000)])
+    with conn:
+        conn.execute("DELETE FROM questoes")
+    livres_antes = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    assert livres_antes > PAGINAS_VACUUM_POR_RODADA
+
+    executar_manutencao(caminho, str(tmp_path / "arquivo.db"))
+    livres_depois = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    # O ANALYZE da mesma rodada reaproveita algumas páginas livres; sem o fix sai só uma
+    assert livres_antes - livres_depois > PAGINAS_VACUUM_POR_RODADA - 50
+    conn.close()
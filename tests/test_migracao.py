@@ -0,0 +1,117 @@
+import json
+import sqlite3
+
+import pytest
+
+from banco import USUARIO_SEM_NOME, VERSAO_ESQUEMA, abrir_conexao
+
+# Esquema original (antes de compressão, FTS, manutenção e cadastros)
+ESQUEMA_BASE = """
+CREATE TABLE usuarios (nome TEXT PRIMARY KEY);
+CREATE TABLE questoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    banca TEXT, cargo TEXT, materia TEXT, tema TEXT,
+    enunciado TEXT, alternativas TEXT, gabarito TEXT,
+    explicacao TEXT, tipo TEXT, fonte TEXT,
+    dificuldade INTEGER DEFAULT 3, tags TEXT DEFAULT '[]',
+    formato_questao TEXT DEFAULT 'Múltipla Escolha',
+    eh_real INTEGER DEFAULT 0, ano_prova INTEGER DEFAULT 0, hash_questao TEXT DEFAULT ''
+);
+CREATE TABLE respostas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario TEXT, questao_id INTEGER, resposta_usuario TEXT,
+    acertou INTEGER, data TEXT, tempo_resposta INTEGER DEFAULT 0
+);
+CREATE TABLE editais_salvos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario TEXT, nome_concurso TEXT, banca TEXT, cargo TEXT,
+    dados_json TEXT, data_analise TEXT, nivel_dificuldade INTEGER DEFAULT 3,
+    formato_questoes TEXT DEFAULT '[]'
+);
+"""
+
+# respostas_resumo como era antes dos cadastros (usuário em texto)
+RESUMO_LEGADO = """
+CREATE TABLE respostas_resumo (
+    usuario TEXT, questao_id INTEGER,
+    tentativas INTEGER DEFAULT 0, acertos INTEGER DEFAULT 0,
+    ultima_resposta TEXT, ultimo_acertou INTEGER, ultima_data TEXT,
+    tempo_total INTEGER DEFAULT 0,
+    PRIMARY KEY (usuario, questao_id)
+);
+"""
+
+RESPOSTAS = [
+    ("Ana", 1, "A", 1), ("ana", 1, "B", 0), ("Ána", 2, "C", 1),
+    ("Bruno", 2, "C", 1), (None, 1, "A", 1), ("", 2, "D", 0),
+]
+
+def criar_banco_legado(caminho, com_resumo=False):
+    conn = sqlite3.connect(caminho)
+    conn.executescript(ESQUEMA_BASE + (RESUMO_LEGADO if com_resumo else ""))
+    conn.executemany("INSERT INTO usuarios (nome) VALUES (?)", [("Ana",), ("ana",), ("Ána",), ("Bruno",)])
+    alternativas = json.dumps({"A": "Certo", "B": "Errado"})
+    conn.executemany(
+        "INSERT INTO questoes (banca, cargo, materia, tema, enunciado, alternativas, gabarito, explicacao) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [("Cebraspe", "Analista", "Direito Penal", "Dolo", "Enunciado 1", alternativas, "A", "Explicação 1"),
+         ("CEBRASPE ", "analista", "Direito penal", "Culpa", "Enunciado 2", alternativas, "C", "Explicação 2")])
+    conn.executemany(
+        "INSERT INTO respostas (usuario, questao_id, resposta_usuario, acertou, data) VALUES (?, ?, ?, ?, '2024-01-01')",
+        RESPOSTAS)
+    conn.execute("INSERT INTO editais_salvos (usuario, nome_concurso, banca, cargo) VALUES ('ana', 'TJ', 'Cebraspe', 'Analista')")
+    if com_resumo:
+        conn.executemany(
+            "INSERT INTO respostas_resumo (usuario, questao_id, tentativas, acertos, ultima_data) VALUES (?, ?, ?, ?, ?)",
+            [("Ana", 1, 3, 2, "2023-05-01"), (None, 2, 1, 0, "2023-01-01"), ("", 2, 2, 1, "2023-02-01")])
+    conn.commit()
+    conn.close()
+
+@pytest.mark.parametrize("com_resumo", [False, True])
+def test_migra_banco_legado_sem_perder_respostas(tmp_path, com_resumo):
+    caminho = str(tmp_path / "legado.db")
+    criar_banco_legado(caminho, com_resumo)
+
+    conn = abrir_conexao(caminho)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == VERSAO_ESQUEMA
+
+    usuarios = dict(conn.execute("SELECT nome, id FROM usuarios").fetchall())
+    assert set(usuarios) == {"Ana", "ana", "Ána", "Bruno", USUARIO_SEM_NOME}
+
+    migradas = conn.execute("""
+    SELECT u.nome, r.questao_id, r.resposta_usuario, r.acertou
+    FROM respostas r JOIN usuarios u ON u.id = r.usuario_id ORDER BY r.id
+    """).fetchall()
+    esperadas = [(usuario or USUARIO_SEM_NOME, questao, resposta, acertou) for usuario, questao, resposta, acertou in RESPOSTAS]
+    assert migradas == esperadas
+
+    edital = conn.execute("SELECT u.nome FROM editais_salvos e JOIN usuarios u ON u.id = e.usuario_id").fetchall()
+    assert edital == [("ana",)]
+
+    # Bancas, cargos e matérias com grafias diferentes caem no mesmo cadastro
+    questoes = conn.execute("SELECT banca, cargo, materia, tema FROM questoes_nomeadas ORDER BY id").fetchall()
+    assert questoes == [("Cebraspe", "Analista", "Direito Penal", "Dolo"), ("Cebraspe", "Analista", "Direito Penal", "Culpa")]
+
+    if com_resumo:
+        resumo = conn.execute("""
+        SELECT u.nome, s.questao_id, s.tentativas, s.acertos, s.ultima_data
+        FROM respostas_resumo s JOIN usuarios u ON u.id = s.usuario_id ORDER BY u.nome
+        """).fetchall()
+        assert resumo == [(USUARIO_SEM_NOME, 2, 3, 1, "2023-02-01"), ("Ana", 1, 3, 2, "2023-05-01")]
+    else:
+        assert conn.execute("SELECT COUNT(*) FROM respostas_resumo").fetchone()[0] == 0
+
+    # Nenhuma chave estrangeira ficou apontando para tabela temporária da migração
+    tabelas = {nome for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for tabela in ("questoes", "respostas", "respostas_resumo", "editais_salvos"):
+        assert {linha[2] for linha in conn.execute(f"PRAGMA foreign_key_list({tabela})")} <= tabelas
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    with conn:
+        conn.execute("INSERT INTO respostas_resumo (usuario_id, questao_id, tentativas) VALUES (?, 2, 1)", (usuarios["Bruno"],))
+        conn.execute("INSERT INTO respostas (usuario_id, questao_id, acertou, data) VALUES (?, 2, 1, '2024-02-01')", (usuarios["Bruno"],))
+    conn.close()
+
+    # Reabrir um banco já migrado não muda nada
+    conn = abrir_conexao(caminho)
+    assert conn.execute("SELECT COUNT(*) FROM respostas").fetchone()[0] == len(RESPOSTAS) + 1
+    assert conn.execute("SELECT COUNT(*) FROM usuarios").fetchone()[0] == 5
+    conn.close()
@@ -0,0 +1,47 @@
+from modelos_prompt import TIPO_INEDITAS, TIPO_REAIS, decodificar_questoes
+
+CAMPOS_A_E = {"fonte": "Inédita - Cebraspe", "formato": "Múltipla Escolha (A a E)"}
+CAMPOS_CERTO_ERRADO = {"fonte": "Prova Real - Cebraspe", "formato": "Certo/Errado"}
+
+def test_expande_item_posicional_de_multipla_escolha():
+    item = ["Enunciado", ["a", "b", "c", "d", "e"], "B", "Geral", ["ca", "cb", "cc", "cd", "ce"]]
+    [questao] = decodificar_questoes({"q": [item]}, TIPO_INEDITAS, CAMPOS_A_E)
+    assert questao["enunciado"] == "Enunciado"
+    assert questao["alternativas"] == {"A": "a", "B": "b", "C": "c", "D": "d", "E": "e"}
+    assert questao["gabarito"] == "B"
+    assert questao["comentarios"]["E"] == "ce"
+    assert questao["fonte"] == "Inédita - Cebraspe"
+
+def test_expande_item_de_certo_errado_com_ano():
+    [questao] = decodificar_questoes({"q": [["Assertiva", "c", "Geral", "2019"]]}, TIPO_REAIS, CAMPOS_CERTO_ERRADO)
+    assert questao["gabarito"] == "Certo"
+    assert questao["alternativas"] == {}
+    assert questao["ano_prova"] == 2019
+
+def test_descarta_itens_fora_do_esquema():
+    itens = [
+        ["Sem ano", "C", "Geral"],
+        ["Com campo a mais", "C", "Geral", 2020, "extra"],
+        "texto solto",
+        None,
+        42,
+        ["Válida", "E", "Geral", 2021],
+    ]
+    questoes = decodificar_questoes({"q": itens}, TIPO_REAIS, CAMPOS_CERTO_ERRADO)
+    assert [questao["enunciado"] for questao in questoes] == ["Válida"]
+    assert questoes[0]["gabarito"] == "Errado"
+
+def test_aceita_formato_verboso_antigo():
+    verboso = {"questoes": [{"enunciado": "Antigo", "alternativas": {"A": "x"}, "gabarito": "A"}]}
+    [questao] = decodificar_questoes(verboso, TIPO_INEDITAS, CAMPOS_A_E)
+    assert questao["enunciado"] == "Antigo"
+    assert questao["formato"] == "Múltipla Escolha (A a E)"
+
+    # Certo/Errado no formato antigo também converte o "C"/"E" que o prefixo pede
+    verboso = {"questoes": [
+        {"enunciado": "Assertiva 1", "gabarito": "C"},
+        {"enunciado": "Assertiva 2", "gabarito": "e"},
+        {"enunciado": "Assertiva 3", "gabarito": "Certo"},
+    ]}
+    questoes = decodificar_questoes(verboso, TIPO_REAIS, CAMPOS_CERTO_ERRADO)
+    assert [questao["gabarito"] for questao in questoes] == ["Certo", "Errado", "Certo"]
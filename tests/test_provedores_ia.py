@@ -0,0 +1,87 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from provedores_ia import ProvedorIA, RoteadorIA
+
+# Cliente falso: responde depois de `atraso` segundos ou levanta `erro`; respeita o timeout pedido
+class ClienteFalso:
+    def __init__(self, atraso=0.0, erro=None):
+        self.atraso = atraso
+        self.erro = erro
+        self.chamadas = []
+        self.concluidas = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.criar))
+
+    def criar(self, **parametros):
+        self.chamadas.append(parametros)
+        try:
+            if self.erro is not None:
+                raise self.erro
+            if self.atraso > parametros["timeout"]:
+                time.sleep(parametros["timeout"])
+                raise TimeoutError("tempo esgotado")
+            time.sleep(self.atraso)
+            return SimpleNamespace(usage=None)
+        finally:
+            self.concluidas += 1
+
+def roteador(*clientes, atraso_hedge=0.2, timeout=5.0, **kwargs):
+    provedores = [ProvedorIA(f"P{i}", cliente, "modelo", timeout=timeout) for i, cliente in enumerate(clientes)]
+    return RoteadorIA(provedores, atraso_hedge=atraso_hedge, **kwargs)
+
+MENSAGENS = [{"role": "user", "content": "oi"}]
+
+def test_provedor_rapido_responde_sem_hedge():
+    rapido, reserva = ClienteFalso(0.01), ClienteFalso(0.01)
+    resposta, nome = roteador(rapido, reserva).gerar(MENSAGENS, 0.0, preferido="P0")
+    assert nome == "P0"
+    assert rapido.chamadas[0]["timeout"] == 5.0
+    assert reserva.chamadas == []
+
+def test_provedor_lento_aciona_o_proximo_depois_do_atraso():
+    lento, rapido = ClienteFalso(1.0), ClienteFalso(0.05)
+    inicio = time.monotonic()
+    _, nome = roteador(lento, rapido).gerar(MENSAGENS, 0.0, preferido="P0")
+    assert nome == "P1"
+    assert 0.2 <= time.monotonic() - inicio < 0.6
+
+def test_erro_aciona_o_proximo_sem_esperar_o_hedge():
+    falho, reserva = ClienteFalso(erro=RuntimeError("429")), ClienteFalso(0.01)
+    r = roteador(falho, reserva, atraso_hedge=5.0)
+    inicio = time.monotonic()
+    _, nome = r.gerar(MENSAGENS, 0.0, preferido="P0")
+    assert nome == "P1"
+    assert time.monotonic() - inicio < 1.0
+    assert r.provedores["P0"].taxa_erro_ewma > 0
+
+def test_todos_falham_levanta_o_ultimo_erro():
+    r = roteador(ClienteFalso(erro=RuntimeError("primeiro")), ClienteFalso(erro=RuntimeError("segundo")))
+    with pytest.raises(RuntimeError, match="segundo"):
+        r.gerar(MENSAGENS, 0.0, preferido="P0")
+
+def test_perdedora_travada_libera_a_thread_pelo_timeout():
+    travado, rapido = ClienteFalso(30.0), ClienteFalso(0.01)
+    r = roteador(travado, rapido, atraso_hedge=0.1, timeout=0.4)
+    _, nome = r.gerar(MENSAGENS, 0.0, preferido="P0")
+    assert nome == "P1"
+    time.sleep(0.5)
+    assert travado.concluidas == 1
+    assert r.provedores["P0"].taxa_erro_ewma > 0
+
+def test_hedge_so_conta_depois_que_a_chamada_sai_da_fila():
+    r = roteador(ClienteFalso(0.1), ClienteFalso(0.01), atraso_hedge=0.2, max_chamadas=1)
+    liberar = threading.Event()
+    r._executor.submit(liberar.wait)  # ocupa a única thread do executor
+    threading.Timer(0.5, liberar.set).start()
+
+    enviadas = []
+    submeter = r._executor.submit
+    r._executor.submit = lambda funcao, *args: enviadas.append(funcao) or submeter(funcao, *args)
+
+    _, nome = r.gerar(MENSAGENS, 0.0, preferido="P0")
+    # P0 só começou aos 0,5 s e respondeu em 0,1 s, antes do hedge de 0,2 s: P1 nem foi disparado
+    assert nome == "P0"
+    assert len(enviadas) == 1
@@ -0,0 +1,32 @@
+import json
+
+from banco import abrir_conexao
+from compressao import AMOSTRAS_MINIMAS, CABECALHO, carregar_codec
+from transferencia_banco import exportar_questoes, importar_questoes
+
+def test_importacao_em_banco_novo_ja_deixa_o_dicionario_treinado(tmp_path):
+    origem = abrir_conexao(str(tmp_path / "origem.db"))
+    with origem:
+        origem.executemany(
+            "INSERT INTO questoes (tema, enunciado, alternativas, gabarito, explicacao) VALUES (?, ?, ?, ?, ?)",
+            [("Atos administrativos", f"Enunciado {i}", json.dumps({"A": "Certo", "B": "Errado"}), "A",
+              json.dumps({"geral": f"Item {i}: a Administração pode anular seus próprios atos, conforme a Súmula 473 do STF."}))
+             for i in range(AMOSTRAS_MINIMAS * 3)])
+    arquivo = str(tmp_path / "questoes.jsonl.gz")
+    assert exportar_questoes(origem, arquivo) == AMOSTRAS_MINIMAS * 3
+    origem.close()
+
+    caminho = str(tmp_path / "destino.db")
+    destino = abrir_conexao(caminho)
+    assert importar_questoes(destino, arquivo, tamanho_lote=AMOSTRAS_MINIMAS) == (AMOSTRAS_MINIMAS * 3, 0)
+    assert destino.execute("SELECT COUNT(*) FROM dicionarios_compressao").fetchone()[0] == 1
+    explicacoes = [valor for (valor,) in destino.execute("SELECT explicacao FROM questoes")]
+    assert all(CABECALHO.unpack_from(valor)[2] == 1 for valor in explicacoes)
+    destino.close()
+
+    # Reabrir não treina outro dicionário nem recomprime
+    destino = abrir_conexao(caminho)
+    assert destino.execute("SELECT COUNT(*) FROM dicionarios_compressao").fetchone()[0] == 1
+    codec = carregar_codec(destino)
+    assert "Súmula 473" in json.loads(codec.descomprimir(explicacoes[-1]))["geral"]
+    destino.close()
@@ -0,0 +1,196 @@
+import argparse
+import gzip
+import json
+
+from banco import NOME_BANCO, abrir_conexao, canonizar_nome, gerar_hash_questao, obter_id_cadastro
+from compressao import CAMPOS_COMPRIMIDOS, carregar_codec, preparar_codec, recomprimir_questoes
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# ================= EXPORTAÇÃO / IMPORTAÇÃO DO BANCO DE QUESTÕES =================
+# Move apenas a tabela `questoes` entre instalações, em lotes, sem carregar o
+# banco inteiro em memória. Parquet quando o pyarrow estiver disponível,
+# JSONL comprimido (.jsonl.gz) caso contrário. O arquivo leva os campos em texto
+# puro e banca/cargo/matéria pelo nome; compressão e ids dos cadastros de cada
+# banco são aplicados na importação.
+
+TAMANHO_LOTE = 5000
+LIMITE_PARAMETROS_SQL = 900
+# O nível 9 padrão do gzip dominava o tempo da exportação; o 4 custa poucos por cento de tamanho
+NIVEL_GZIP = 4
+
+COLUNAS_QUESTAO = [
+    "banca", "cargo", "materia", "tema", "enunciado", "alternativas", "gabarito",
+    "explicacao", "tipo", "fonte", "dificuldade", "tags", "formato_questao",
+    "eh_real", "ano_prova", "hash_questao",
+]
+COLUNAS_INTEIRAS = {"dificuldade": 3, "eh_real": 0, "ano_prova": 0}
+COLUNAS_CADASTRO = {"banca": "bancas", "cargo": "cargos", "materia": "materias"}
+COLUNAS_INSERCAO = [f"{coluna}_id" if coluna in COLUNAS_CADASTRO else coluna for coluna in COLUNAS_QUESTAO]
+
+def _eh_parquet(caminho):
+    return str(caminho).lower().endswith(".parquet")
+
+def _exigir_pyarrow():
+    if pq is None:
+        raise RuntimeError("pyarrow não está instalado. Use um arquivo .jsonl.gz ou instale o pyarrow.")
+
+def _normalizar_registro(registro):
+    linha = {}
+    for coluna in COLUNAS_QUESTAO:
+        valor = registro.get(coluna)
+        if coluna in COLUNAS_INTEIRAS:
+            valor = int(valor) if valor not in (None, "") else COLUNAS_INTEIRAS[coluna]
+        elif valor is None:
+            valor = "[]" if coluna == "tags" else ""
+        linha[coluna] = valor
+    if not linha["hash_questao"]:
+        linha["hash_questao"] = gerar_hash_questao(linha["enunciado"], linha["gabarito"])
+    return linha
+
+def _lotes_do_banco(conn, tamanho_lote):
+    codec = carregar_codec(conn)
+    cur = conn.cursor()
+    cur.execute(f"SELECT {', '.join(COLUNAS_QUESTAO)} FROM questoes_nomeadas ORDER BY id")
+    while True:
+        linhas = cur.fetchmany(tamanho_lote)
+        if not linhas:
+            break
+        lote = []
+        for linha in linhas:
+            registro = dict(zip(COLUNAS_QUESTAO, linha))
+            for campo in CAMPOS_COMPRIMIDOS:
+                registro[campo] = codec.descomprimir(registro[campo])
+            lote.append(_normalizar_registro(registro))
+        yield lote
+
+def _lotes_do_arquivo(caminho, tamanho_lote):
+    if _eh_parquet(caminho):
+        _exigir_pyarrow()
+        arquivo = pq.ParquetFile(caminho)
+        for lote in arquivo.iter_batches(batch_size=tamanho_lote):
+            yield lote.to_pylist()
+        return
+
+    abrir = gzip.open if str(caminho).lower().endswith(".gz") else open
+    with abrir(caminho, "rt", encoding="utf-8") as arq:
+        lote = []
+        for linha in arq:
+            if not linha.strip():
+                continue
+            lote.append(json.loads(linha))
+            if len(lote) >= tamanho_lote:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+
+def exportar_questoes(conn, caminho, tamanho_lote=TAMANHO_LOTE):
+    total = 0
+    if _eh_parquet(caminho):
+        _exigir_pyarrow()
+        schema = pa.schema([
+            (coluna, pa.int64() if coluna in COLUNAS_INTEIRAS else pa.string())
+            for coluna in COLUNAS_QUESTAO
+        ])
+        with pq.ParquetWriter(caminho, schema, compression="zstd") as escritor:
+            for lote in _lotes_do_banco(conn, tamanho_lote):
+                escritor.write_table(pa.Table.from_pylist(lote, schema=schema))
+                total += len(lote)
+    else:
+        with gzip.open(caminho, "wt", compresslevel=NIVEL_GZIP, encoding="utf-8") as arq:
+            for lote in _lotes_do_banco(conn, tamanho_lote):
+                arq.writelines(json.dumps(registro, ensure_ascii=False) + "\n" for registro in lote)
+                total += len(lote)
+    return total
+
+def _hashes_existentes(cur, hashes):
+    existentes = set()
+    for inicio in range(0, len(hashes), LIMITE_PARAMETROS_SQL):
+        parte = hashes[inicio:inicio + LIMITE_PARAMETROS_SQL]
+        cur.execute(
+            f"SELECT hash_questao FROM questoes WHERE hash_questao IN ({','.join('?' * len(parte))})",
+            parte
+        )
+        existentes.update(row[0] for row in cur.fetchall())
+    return existentes
+
+class _IdsCadastro:
+    def __init__(self, conn):
+        self.conn = conn
+        self.ids = {}
+
+    def obter(self, tabela, nome):
+        chave = (tabela, canonizar_nome(nome))
+        if chave not in self.ids:
+            self.ids[chave] = obter_id_cadastro(self.conn, tabela, nome)
+        return self.ids[chave]
+
+def importar_questoes(conn, caminho, tamanho_lote=TAMANHO_LOTE):
+    codec = carregar_codec(conn)
+    cadastros = _IdsCadastro(conn)
+    cur = conn.cursor()
+    inseridas = 0
+    duplicadas = 0
+    sql_insert = f"""
+    INSERT INTO questoes ({', '.join(COLUNAS_INSERCAO)})
+    VALUES ({', '.join('?' * len(COLUNAS_INSERCAO))})
+    """
+
+    def valor(linha, coluna):
+        if coluna in CAMPOS_COMPRIMIDOS:
+            return codec.comprimir(linha[coluna])
+        if coluna in COLUNAS_CADASTRO:
+            return cadastros.obter(COLUNAS_CADASTRO[coluna], linha[coluna])
+        return linha[coluna]
+
+    for lote in _lotes_do_arquivo(caminho, tamanho_lote):
+        novas = {}
+        for registro in lote:
+            linha = _normalizar_registro(registro)
+            if linha["hash_questao"] in novas:
+                duplicadas += 1
+                continue
+            novas[linha["hash_questao"]] = linha
+
+        existentes = _hashes_existentes(cur, list(novas))
+        duplicadas += len(existentes)
+        cur.executemany(sql_insert, [
+            tuple(valor(linha, coluna) for coluna in COLUNAS_QUESTAO)
+            for hash_q, linha in novas.items() if hash_q not in existentes
+        ])
+        inseridas += len(novas) - len(existentes)
+        conn.commit()
+
+        # Banco sem dicionário (instalação nova): treina assim que houver amostras e segue
+        # comprimindo com ele. Sem isso, o próximo abrir_conexao (início do app) treinaria
+        # e recomprimiria o banco inteiro, com VACUUM.
+        if not codec.id_ativo:
+            codec, treinou = preparar_codec(conn)
+            if treinou:
+                recomprimir_questoes(conn, codec)
+
+    return inseridas, duplicadas
+
+# ================= LINHA DE COMANDO =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta ou importa o banco de questões (sem respostas de usuários).")
+    parser.add_argument("comando", choices=["exportar", "importar"])
+    parser.add_argument("arquivo", help="Destino/origem: .parquet (requer pyarrow) ou .jsonl.gz")
+    parser.add_argument("--banco", default=NOME_BANCO, help="Arquivo SQLite (padrão: %(default)s)")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="Questões por lote (padrão: %(default)s)")
+    args = parser.parse_args()
+
+    conn = abrir_conexao(args.banco)
+    if args.comando == "exportar":
+        total = exportar_questoes(conn, args.arquivo, args.lote)
+        print(f"{total} questões exportadas para {args.arquivo}")
+    else:
+        inseridas, duplicadas = importar_questoes(conn, args.arquivo, args.lote)
+        print(f"{inseridas} questões importadas, {duplicadas} duplicadas descartadas")
+    conn.close()
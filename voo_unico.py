@@ -0,0 +1,65 @@
+import functools
+import hashlib
+import json
+import threading
+
+# ================= SINGLE-FLIGHT =================
+# Chamadas idênticas feitas ao mesmo tempo (mesma chave normalizada) são coalescidas:
+# a primeira executa, as demais esperam e recebem o mesmo resultado (ou a mesma exceção).
+# Nada fica em cache depois que a chamada termina.
+
+class _Chamada:
+    def __init__(self):
+        self.concluida = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+class VooUnico:
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._em_voo = {}
+
+    def executar(self, chave, funcao, *args, **kwargs):
+        with self._trava:
+            chamada = self._em_voo.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = _Chamada()
+                self._em_voo[chave] = chamada
+
+        if not lider:
+            chamada.concluida.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = funcao(*args, **kwargs)
+        except Exception as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._trava:
+                del self._em_voo[chave]
+            chamada.concluida.set()
+        return chamada.resultado
+
+def normalizar_chave(*partes):
+    return tuple(" ".join(str(parte).split()).casefold() for parte in partes)
+
+# Entra na chave de pedidos a modelos: dois pedidos só coalescem se o prompt for o mesmo
+# (contexto da web, exemplos locais e instruções incluídos), não só os mesmos filtros
+def assinatura_mensagens(mensagens):
+    return hashlib.sha256(json.dumps(mensagens, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+# Uma instância por processo: o módulo é importado uma vez, ao contrário do app.py,
+# que o Streamlit reexecuta a cada interação.
+VOO_UNICO = VooUnico()
+
+def coalescer(nome):
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args):
+            return VOO_UNICO.executar(normalizar_chave(nome, *args), funcao, *args)
+        return envoltorio
+    return decorador